@@ -0,0 +1,116 @@
+import argparse
+import json
+
+from app.config import JOB_PROCESSES
+from app.db import migrations
+from app.db.database import get_conn, init_db
+from app.db.query_plans import check_query_plans
+from app.services.bulk_ingest import BULK_BATCH_SIZE, bulk_ingest, pending_photo_ids
+from app.services.jobs import JobWorker
+from app.services.thumbnails import purge_thumbnails
+from app.services.uploads import collect_garbage
+from app.services.wardrobe import backfill_hsl
+
+def _gc_uploads(args: argparse.Namespace) -> None:
+    conn = get_conn()
+    try:
+        result = collect_garbage(conn, grace_seconds=args.grace, dry_run=args.dry_run)
+    finally:
+        conn.close()
+    if not args.dry_run:
+        result["thumbnails_removed"] = purge_thumbnails(result["paths"])
+    print(json.dumps(result))
+
+def _bulk_ingest(args: argparse.Namespace) -> None:
+    conn = get_conn()
+    # a process pool only: this command must not start draining the job queue
+    runner = JobWorker(threads=0, processes=args.processes)
+    runner.start()
+    try:
+        ids = args.photo_id or pending_photo_ids(conn, args.limit)
+        result = bulk_ingest(conn, ids, batch_size=args.batch_size, runner=runner)
+    finally:
+        runner.stop()
+        conn.close()
+    print(json.dumps(result))
+
+def _backfill_hsl(args: argparse.Namespace) -> None:
+    conn = get_conn()
+    try:
+        result = backfill_hsl(conn, chunk_size=args.chunk_size, after_id=args.after_id, pause=args.pause)
+    finally:
+        conn.close()
+    print(json.dumps(result))
+
+def _migrate(args: argparse.Namespace) -> None:
+    # main() has already applied anything pending; report what that did
+    print(json.dumps(migrations.last_run))
+
+def _check_query_plans(args: argparse.Namespace) -> None:
+    conn = get_conn()
+    try:
+        results = check_query_plans(conn)
+    finally:
+        conn.close()
+    print(json.dumps(results, indent=2))
+    if not all(r["ok"] for r in results):
+        raise SystemExit(1)
+
+def _rebuild_search(args: argparse.Namespace) -> None:
+    conn = get_conn()
+    try:
+        with conn:
+            indexed = migrations.rebuild_search_index(conn)
+    finally:
+        conn.close()
+    print(json.dumps({"indexed": indexed}))
+
+def _rebuild_usage(args: argparse.Namespace) -> None:
+    conn = get_conn()
+    try:
+        with conn:
+            counts = migrations.rebuild_usage(conn)
+    finally:
+        conn.close()
+    print(json.dumps(counts))
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Digital Wardrobe maintenance commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gc = sub.add_parser("gc-uploads", help="delete uploaded files no item or closet photo references")
+    gc.add_argument("--grace", type=int, default=3600, help="keep unreferenced files younger than this many seconds")
+    gc.add_argument("--dry-run", action="store_true")
+    gc.set_defaults(func=_gc_uploads)
+
+    bulk = sub.add_parser("bulk-ingest", help="accept pending closet photos and add all detections as items")
+    bulk.add_argument("photo_id", nargs="*", type=int, help="photos to accept (default: all pending)")
+    bulk.add_argument("--limit", type=int, default=None)
+    bulk.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+    bulk.add_argument("--processes", type=int, default=JOB_PROCESSES)
+    bulk.set_defaults(func=_bulk_ingest)
+
+    hsl = sub.add_parser("backfill-hsl", help="compute color_h/s/l for items that only have color_hex")
+    hsl.add_argument("--chunk-size", type=int, default=5000, help="rows per transaction")
+    hsl.add_argument("--after-id", type=int, default=0, help="resume after this item id")
+    hsl.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between chunks")
+    hsl.set_defaults(func=_backfill_hsl)
+
+    mig = sub.add_parser("migrate", help="apply pending schema migrations and print their timings")
+    mig.set_defaults(func=_migrate)
+
+    plans = sub.add_parser("check-query-plans", help="fail if a hot query falls back to a full table scan")
+    plans.set_defaults(func=_check_query_plans)
+
+    search = sub.add_parser("rebuild-search", help="rebuild the items full-text index from items and tags")
+    search.set_defaults(func=_rebuild_search)
+
+    usage = sub.add_parser("rebuild-usage", help="recompute item wear counts and pairings from saved outfits")
+    usage.set_defaults(func=_rebuild_usage)
+
+    args = parser.parse_args(argv)
+    init_db()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
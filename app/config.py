@@ -0,0 +1,25 @@
+import os
+
+DB_POOL_SIZE = int(os.getenv("WARDROBE_DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("WARDROBE_DB_POOL_TIMEOUT", "10"))
+DB_CACHE_SIZE_KIB = int(os.getenv("WARDROBE_DB_CACHE_SIZE_KIB", "16384"))
+DB_MMAP_SIZE = int(os.getenv("WARDROBE_DB_MMAP_SIZE", str(128 * 1024 * 1024)))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("WARDROBE_DB_BUSY_TIMEOUT_MS", "5000"))
+
+UPLOAD_MAX_FILE_BYTES = int(os.getenv("WARDROBE_UPLOAD_MAX_FILE_BYTES", str(25 * 1024 * 1024)))
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("WARDROBE_UPLOAD_MAX_REQUEST_BYTES", str(200 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("WARDROBE_UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+# 0 ranks every match. N > 0 ranks only the N newest matches of a query; older
+# items that would have ranked higher are then missing from the results.
+SEARCH_RANK_WINDOW = int(os.getenv("WARDROBE_SEARCH_RANK_WINDOW", "0"))
+
+JOB_WORKERS = int(os.getenv("WARDROBE_JOB_WORKERS", "2"))
+JOB_PROCESSES = int(os.getenv("WARDROBE_JOB_PROCESSES", "2"))  # 0 runs jobs in the worker threads
+JOB_POLL_SECONDS = float(os.getenv("WARDROBE_JOB_POLL_SECONDS", "1.0"))
+JOB_LEASE_SECONDS = int(os.getenv("WARDROBE_JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("WARDROBE_JOB_MAX_ATTEMPTS", "3"))
+
+METRICS_ENABLED = os.getenv("WARDROBE_METRICS_ENABLED", "1") == "1"
+METRICS_N_PLUS_ONE = int(os.getenv("WARDROBE_METRICS_N_PLUS_ONE", "10"))  # same statement this often per request
+PROFILING_ENABLED = os.getenv("WARDROBE_PROFILING_ENABLED", "0") == "1"  # honours the X-Profile request header
@@ -1,67 +1,242 @@
+import asyncio
+import contextvars
+import functools
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
+from queue import Empty, LifoQueue
+from typing import Callable, Iterator, TypeVar
+
+from app.config import (
+    DB_BUSY_TIMEOUT_MS,
+    DB_CACHE_SIZE_KIB,
+    DB_MMAP_SIZE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    METRICS_ENABLED,
+)
+from app.db.migrations import migrate
+from app.metrics import profiled_call, record_query
 
 DB_PATH = Path(__file__).resolve().parent / "wardrobe.sqlite3"
-SCHEMA_PATH = Path(__file__).resolve().parent / "schema.sql"
+
+class InstrumentedCursor(sqlite3.Cursor):
+    # Times a statement from execute() until its rows are fetched (exhausted,
+    # closed or the cursor dropped) and records it once into app.metrics
+    # (per kind, and per request for N+1 detection).
+    _sql = None
+    _many = False
+    _seconds = 0.0
+
+    def execute(self, sql, parameters=(), /):
+        self._finish()
+        self._sql, self._many, self._seconds = sql, False, 0.0
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        self._finish()
+        self._sql, self._many, self._seconds = sql, True, 0.0
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._timed(super().fetchmany, size)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        try:
+            return self._timed(super().fetchall)
+        finally:
+            self._finish()
+
+    def __next__(self):
+        try:
+            return self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+    def _timed(self, fn, *args):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._seconds += time.perf_counter() - t0
+
+    def _finish(self) -> None:
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            record_query(sql, self._seconds, self._many)
+
+class InstrumentedConnection(sqlite3.Connection):
+    # Every statement, run on the connection or on a cursor, gets an InstrumentedCursor.
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=(), /):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        return self.cursor().executemany(sql, seq_of_parameters)
 
 def get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+    # Opens a standalone connection. Request handlers should use get_db() so
+    # connections (and their pragmas) are reused through the pool.
+    factory = InstrumentedConnection if METRICS_ENABLED else sqlite3.Connection
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, factory=factory)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON;")
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS};")
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KIB};")
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE};")
     return conn
 
-def ensure_ingest_tables(conn: sqlite3.Connection) -> None:
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS closet_photos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            image_path TEXT NOT NULL,
-            source TEXT NOT NULL DEFAULT 'upload',
-            decision TEXT NOT NULL DEFAULT 'pending',
-            created_at TEXT NOT NULL DEFAULT (datetime('now'))
-        )
-        """
-    )
-
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS photo_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            photo_id INTEGER NOT NULL,
-            category TEXT,
-            slot TEXT,
-            bbox_json TEXT,
-            extracted_color_hex TEXT,
-            item_id INTEGER,
-            created_at TEXT NOT NULL DEFAULT (datetime('now')),
-            FOREIGN KEY (photo_id) REFERENCES closet_photos(id) ON DELETE CASCADE,
-            FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE SET NULL
-        )
-        """
-    )
-
-def _ensure_columns(conn: sqlite3.Connection) -> None:
-    def add(sql: str):
+class ConnectionPool:
+    """Bounded pool of configured SQLite connections, created lazily."""
+
+    # stats() key -> (metric type, help), for /metrics
+    STATS_METRICS = {
+        "size": ("gauge", "Most connections the pool will open."),
+        "created": ("counter", "Connections opened by the pool."),
+        "in_use": ("gauge", "Connections checked out right now."),
+        "idle": ("gauge", "Open connections waiting in the pool."),
+        "checkouts": ("counter", "Connections handed out."),
+        "timeouts": ("counter", "Checkouts that gave up waiting for a connection."),
+        "wait_seconds_total": ("counter", "Time spent waiting for a connection."),
+        "wait_seconds_max": ("gauge", "Longest wait for a connection so far."),
+    }
+
+    def __init__(self, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self._idle: LifoQueue[sqlite3.Connection] = LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def acquire(self) -> sqlite3.Connection:
+        start = time.perf_counter()
+        conn = None
         try:
-            conn.execute(sql)
-        except sqlite3.OperationalError:
-            pass
+            conn = self._idle.get_nowait()
+        except Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn = get_conn()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise TimeoutError(f"no database connection available after {self.timeout}s")
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "wait_seconds_total": round(self._wait_total, 6),
+                "wait_seconds_max": round(self._wait_max, 6),
+            }
+
+pool = ConnectionPool()
+
+def get_db() -> Iterator[sqlite3.Connection]:
+    # FastAPI dependency: one pooled connection per request.
+    with pool.connection() as conn:
+        yield conn
+
+T = TypeVar("T")
+
+# Database work from async handlers runs here rather than on the event loop or
+# in the shared AnyIO threadpool; one thread per pooled connection.
+db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="db")
 
-    add("ALTER TABLE items ADD COLUMN image_path TEXT;")
-    add("ALTER TABLE outfits ADD COLUMN locked_slots TEXT;")
+def _with_connection(fn: Callable[..., T], args: tuple, kwargs: dict) -> T:
+    with pool.connection() as conn:
+        return profiled_call(fn, conn, *args, **kwargs)
 
-    add("ALTER TABLE items ADD COLUMN color_hex TEXT;")
-    add("ALTER TABLE items ADD COLUMN color_h INTEGER;")
-    add("ALTER TABLE items ADD COLUMN color_s INTEGER;")
-    add("ALTER TABLE items ADD COLUMN color_l INTEGER;")
+async def run_db(fn: Callable[..., T], *args, **kwargs) -> T:
+    # await run_db(fn, ...) -> fn(conn, ...) on a db thread with a pooled connection.
+    # Runs in a copy of the caller's context so per-request metrics follow along.
+    loop = asyncio.get_running_loop()
+    call = functools.partial(_with_connection, fn, args, kwargs)
+    return await loop.run_in_executor(db_executor, contextvars.copy_context().run, call)
 
-def init_db() -> None:
+def init_db() -> list[dict]:
+    # Applies pending migrations (see app/db/migrations.py); returns what ran.
     conn = get_conn()
     try:
-        schema = SCHEMA_PATH.read_text(encoding="utf-8")
-        conn.executescript(schema)
-        _ensure_columns(conn)
-        ensure_ingest_tables(conn)
-        conn.commit()
+        return migrate(conn)
     finally:
         conn.close()
@@ -0,0 +1,364 @@
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable
+
+log = logging.getLogger(__name__)
+
+SCHEMA_PATH = Path(__file__).resolve().parent / "schema.sql"
+
+def _statements(script: str):
+    # executescript() would commit our transaction, so split the script ourselves
+    buf = ""
+    for line in script.splitlines(keepends=True):
+        buf += line
+        if sqlite3.complete_statement(buf):
+            yield buf.strip()
+            buf = ""
+    if buf.strip():
+        yield buf.strip()
+
+def _add_columns(conn: sqlite3.Connection, table: str, columns: dict[str, str]) -> None:
+    existing = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+    for name, decl in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+def _ingest_tables(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS closet_photos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            image_path TEXT NOT NULL,
+            source TEXT NOT NULL DEFAULT 'upload',
+            decision TEXT NOT NULL DEFAULT 'pending',
+            created_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+        """
+    )
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS photo_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            photo_id INTEGER NOT NULL,
+            category TEXT,
+            slot TEXT,
+            bbox_json TEXT,
+            extracted_color_hex TEXT,
+            item_id INTEGER,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            FOREIGN KEY (photo_id) REFERENCES closet_photos(id) ON DELETE CASCADE,
+            FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE SET NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_photo_items_photo_id ON photo_items(photo_id)")
+
+def _upload_blobs(conn: sqlite3.Connection) -> None:
+    # One row per stored upload file. refcount is kept by triggers on the
+    # tables whose image_path points at it; 0 means garbage once past the grace period.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS upload_blobs (
+            path TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_closet_photos_image_path ON closet_photos(image_path)")
+
+    for table in ("items", "closet_photos"):
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_blob_insert AFTER INSERT ON {table}
+            WHEN NEW.image_path IS NOT NULL
+            BEGIN
+                UPDATE upload_blobs SET refcount = refcount + 1 WHERE path = NEW.image_path;
+            END
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_blob_update AFTER UPDATE OF image_path ON {table}
+            WHEN NEW.image_path IS NOT OLD.image_path
+            BEGIN
+                UPDATE upload_blobs SET refcount = refcount - 1 WHERE path = OLD.image_path;
+                UPDATE upload_blobs SET refcount = refcount + 1 WHERE path = NEW.image_path;
+            END
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_blob_delete AFTER DELETE ON {table}
+            WHEN OLD.image_path IS NOT NULL
+            BEGIN
+                UPDATE upload_blobs SET refcount = refcount - 1 WHERE path = OLD.image_path;
+            END
+            """
+        )
+
+def _baseline(conn: sqlite3.Connection) -> None:
+    # Everything the old init_db did on each start. Idempotent, so databases
+    # created before user_version was tracked are brought up to date in place.
+    for stmt in _statements(SCHEMA_PATH.read_text(encoding="utf-8")):
+        conn.execute(stmt)
+    _add_columns(conn, "items", {
+        "image_path": "TEXT",
+        "color_hex": "TEXT",
+        "color_h": "INTEGER",
+        "color_s": "INTEGER",
+        "color_l": "INTEGER",
+    })
+    _add_columns(conn, "outfits", {"locked_slots": "TEXT"})
+    _ingest_tables(conn)
+    _upload_blobs(conn)
+
+def _engine_indexes(conn: sqlite3.Connection) -> None:
+    # Coarse colour bucket derived from HSL. VIRTUAL: computed on read, costs
+    # nothing to store, and can still be indexed. Keep in step with
+    # color_utils.COLOR_FAMILIES.
+    _add_columns(conn, "items", {
+        "color_family": """TEXT GENERATED ALWAYS AS (
+            CASE
+                WHEN color_h IS NULL THEN NULL
+                WHEN color_s < 15 OR color_l < 12 OR color_l > 92 THEN 'neutral'
+                WHEN color_h < 15 OR color_h >= 345 THEN 'red'
+                WHEN color_h < 45 THEN 'orange'
+                WHEN color_h < 70 THEN 'yellow'
+                WHEN color_h < 165 THEN 'green'
+                WHEN color_h < 195 THEN 'teal'
+                WHEN color_h < 255 THEN 'blue'
+                WHEN color_h < 290 THEN 'purple'
+                ELSE 'pink'
+            END
+        ) VIRTUAL""",
+    })
+    # the engine's query shape: slot category, formality floor, then hue
+    conn.execute("DROP INDEX IF EXISTS idx_items_category_formality")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_items_engine ON items(category, formality, color_h, id)")
+    # listing filters, newest first (rowid is the implicit last column)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_items_category_id ON items(category, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_items_color_family ON items(color_family, id)")
+    # ON DELETE actions of items look these up
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_outfit_items_item_id ON outfit_items(item_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_photo_items_item_id ON photo_items(item_id)")
+
+def _item_tag_lookup(conn: sqlite3.Connection) -> None:
+    # item_tags' primary key is (item_id, tag_id); the tag filter needs the reverse
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_item_tags_tag_id ON item_tags(tag_id, item_id)")
+
+# space-separated tag names of one item, for the search index
+_ITEM_TAGS_SQL = """
+    SELECT coalesce(group_concat(t.name, ' '), '')
+    FROM item_tags it JOIN tags t ON t.id = it.tag_id
+    WHERE it.item_id = {item_id}
+"""
+
+def rebuild_search_index(conn: sqlite3.Connection) -> int:
+    # Repopulates items_fts from items/item_tags; returns the number of rows indexed.
+    conn.execute("DELETE FROM items_fts")
+    cur = conn.execute(
+        f"""
+        INSERT INTO items_fts (rowid, name, category, color_primary, color_secondary, notes, tags)
+        SELECT i.id, i.name, i.category, i.color_primary, i.color_secondary, i.notes,
+               ({_ITEM_TAGS_SQL.format(item_id="i.id")})
+        FROM items i
+        """
+    )
+    conn.execute("INSERT INTO items_fts (items_fts) VALUES ('optimize')")
+    return cur.rowcount
+
+def _items_fts(conn: sqlite3.Connection) -> None:
+    # Full-text index over the free-text item fields plus tag names, keyed by
+    # item id (rowid). It keeps its own copy of the text so snippet() works and
+    # tag names need no join. Triggers keep it in step with items and item_tags.
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+            name, category, color_primary, color_secondary, notes, tags,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_items_fts_insert AFTER INSERT ON items
+        BEGIN
+            INSERT INTO items_fts (rowid, name, category, color_primary, color_secondary, notes, tags)
+            VALUES (NEW.id, NEW.name, NEW.category, NEW.color_primary, NEW.color_secondary, NEW.notes, '');
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_items_fts_update
+        AFTER UPDATE OF name, category, color_primary, color_secondary, notes ON items
+        BEGIN
+            UPDATE items_fts
+            SET name = NEW.name, category = NEW.category, color_primary = NEW.color_primary,
+                color_secondary = NEW.color_secondary, notes = NEW.notes
+            WHERE rowid = NEW.id;
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_items_fts_delete AFTER DELETE ON items
+        BEGIN
+            DELETE FROM items_fts WHERE rowid = OLD.id;
+        END
+        """
+    )
+    for event, ref in (("INSERT", "NEW"), ("DELETE", "OLD")):
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_item_tags_fts_{event.lower()} AFTER {event} ON item_tags
+            BEGIN
+                UPDATE items_fts SET tags = ({_ITEM_TAGS_SQL.format(item_id=f"{ref}.item_id")})
+                WHERE rowid = {ref}.item_id;
+            END
+            """
+        )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_tags_fts_rename AFTER UPDATE OF name ON tags
+        BEGIN
+            UPDATE items_fts SET tags = ({_ITEM_TAGS_SQL.format(item_id="items_fts.rowid")})
+            WHERE rowid IN (SELECT item_id FROM item_tags WHERE tag_id = NEW.id);
+        END
+        """
+    )
+    rebuild_search_index(conn)
+
+def rebuild_usage(conn: sqlite3.Connection) -> dict:
+    # Recomputes item_usage and item_pairs from the saved outfits.
+    conn.execute("DELETE FROM item_usage")
+    conn.execute("DELETE FROM item_pairs")
+    items = conn.execute(
+        """
+        INSERT INTO item_usage (item_id, wear_count, last_outfit_id, last_worn_at)
+        SELECT oi.item_id, COUNT(*), MAX(oi.outfit_id), MAX(o.created_at)
+        FROM outfit_items oi JOIN outfits o ON o.id = oi.outfit_id
+        GROUP BY oi.item_id
+        """
+    ).rowcount
+    pairs = conn.execute(
+        """
+        INSERT INTO item_pairs (item_a, item_b, count, last_outfit_id)
+        SELECT a.item_id, b.item_id, COUNT(*), MAX(a.outfit_id)
+        FROM outfit_items a JOIN outfit_items b ON b.outfit_id = a.outfit_id AND b.item_id > a.item_id
+        GROUP BY a.item_id, b.item_id
+        """
+    ).rowcount
+    return {"items": items, "pairs": pairs}
+
+def _usage_aggregates(conn: sqlite3.Connection) -> None:
+    # Per-item wear counts and per-pair co-occurrence, kept up to date by
+    # outfits_save (app/services/usage.py) so recommendations never walk history.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS item_usage (
+          item_id INTEGER PRIMARY KEY,
+          wear_count INTEGER NOT NULL DEFAULT 0,
+          last_outfit_id INTEGER,
+          last_worn_at TEXT,
+          FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_item_usage_last_outfit ON item_usage(last_outfit_id, item_id)")
+    # one row per unordered pair, item_a < item_b
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS item_pairs (
+          item_a INTEGER NOT NULL,
+          item_b INTEGER NOT NULL,
+          count INTEGER NOT NULL DEFAULT 0,
+          last_outfit_id INTEGER,
+          PRIMARY KEY (item_a, item_b),
+          FOREIGN KEY (item_a) REFERENCES items(id) ON DELETE CASCADE,
+          FOREIGN KEY (item_b) REFERENCES items(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_item_pairs_item_b ON item_pairs(item_b)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_item_pairs_count ON item_pairs(count, item_a, item_b)")
+    rebuild_usage(conn)
+
+def _job_claims(conn: sqlite3.Connection) -> None:
+    # per-claim token, so a worker whose lease expired cannot finish a job
+    # that another worker has since claimed
+    _add_columns(conn, "jobs", {"claimed_by": "TEXT"})
+
+def _job_results(conn: sqlite3.Connection) -> None:
+    # JSON summary a job's store step returned, shown on its status page
+    _add_columns(conn, "jobs", {"result": "TEXT"})
+
+def _engine_covering_index(conn: sqlite3.Connection) -> None:
+    # idx_items_engine plus every other column wardrobe.load_candidates reads,
+    # so the snapshot rebuild never visits the table (rowid is the implicit id)
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_items_engine_covering
+        ON items(category, formality, color_h, color_s, color_l, warmth, color_primary, name, image_path)
+        """
+    )
+    conn.execute("DROP INDEX IF EXISTS idx_items_engine")
+
+# (user_version, name, apply). Append only; never edit a migration that has shipped.
+MIGRATIONS: list[tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "baseline", _baseline),
+    (2, "engine_indexes", _engine_indexes),
+    (3, "item_tag_lookup", _item_tag_lookup),
+    (4, "items_fts", _items_fts),
+    (5, "usage_aggregates", _usage_aggregates),
+    (6, "job_claims", _job_claims),
+    (7, "job_results", _job_results),
+    (8, "engine_covering_index", _engine_covering_index),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# what the last migrate() call in this process did (for /health/db and the CLI)
+last_run: dict = {"version": None, "applied": [], "seconds": 0.0}
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn: sqlite3.Connection) -> list[dict]:
+    """Apply pending migrations; a single pragma read when already current.
+
+    Pending migrations run in one exclusive transaction. The version is read
+    again once the lock is held, so concurrent workers starting together
+    apply each migration exactly once.
+    """
+    started = time.perf_counter()
+    applied: list[dict] = []
+    version = schema_version(conn)
+
+    if version < LATEST_VERSION:
+        conn.execute("BEGIN EXCLUSIVE")
+        try:
+            version = schema_version(conn)
+            for target, name, apply in MIGRATIONS:
+                if target <= version:
+                    continue
+                t0 = time.perf_counter()
+                apply(conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+                version = target
+                seconds = round(time.perf_counter() - t0, 4)
+                applied.append({"version": target, "name": name, "seconds": seconds})
+                log.info("applied migration %d (%s) in %.4fs", target, name, seconds)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    last_run.update(version=version, applied=applied, seconds=round(time.perf_counter() - started, 4))
+    return applied
@@ -0,0 +1,65 @@
+import re
+import sqlite3
+
+from app.services.history import HISTORY_OUTFITS_BEFORE_SQL, HISTORY_OUTFITS_SQL, history_items_sql
+from app.services.listing import items_page_sql
+from app.services.usage import PAIRINGS_SQL, RECENT_WEAR_SQL
+from app.services.wardrobe import BACKFILL_HSL_SQL, candidates_sql, items_by_id_sql
+
+# Hot queries and representative parameters, built by the same functions and
+# constants the app runs; `python -m app.cli check-query-plans` fails if any of
+# them scans a table (tests/test_query_plans.py runs the same check).
+HOT_QUERIES: dict[str, tuple[str, tuple]] = {
+    "wardrobe.load_candidates": candidates_sql(),
+    "wardrobe.load_candidates(context)": candidates_sql("office"),
+    "wardrobe.load_items_by_id": items_by_id_sql([1, 2, 3]),
+    "wardrobe.backfill_hsl": (BACKFILL_HSL_SQL, (0, 5000)),
+    "items.page(first)": items_page_sql(None, 51),
+    "items.page": items_page_sql(1000, 51),
+    "items.page(category, first)": items_page_sql(None, 51, category="top"),
+    "items.page(category)": items_page_sql(1000, 51, category="top", formality_min=3),
+    "items.page(color_family)": items_page_sql(1000, 51, color_family="blue"),
+    "items.page(tag)": items_page_sql(1000, 51, category="top", tag_id=1),
+    "items.get": ("SELECT * FROM items WHERE id = ?", (1,)),
+    # lookups SQLite runs for the ON DELETE actions of items
+    "items.delete(outfit_items cascade)": ("SELECT outfit_id FROM outfit_items WHERE item_id = ?", (1,)),
+    "items.delete(photo_items set null)": ("SELECT id FROM photo_items WHERE item_id = ?", (1,)),
+    "items.delete(item_pairs cascade)": ("SELECT item_a FROM item_pairs WHERE item_b = ?", (1,)),
+    "history.outfits(first)": (HISTORY_OUTFITS_SQL, (51,)),
+    "history.outfits": (HISTORY_OUTFITS_BEFORE_SQL, (1000, 51)),
+    "history.items": history_items_sql([1, 2, 3]),
+    "usage.recent_wear": (RECENT_WEAR_SQL, (970,)),
+    "usage.load_pairings": (PAIRINGS_SQL, (2, 200)),
+}
+# these must be answered from an index alone
+COVERING_QUERIES = {"wardrobe.load_candidates", "wardrobe.load_candidates(context)"}
+
+# "SCAN items" alone is a full table scan; "SCAN items USING INDEX ..." walks an index
+_FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+_ORDERED_LIMIT = re.compile(r"\bORDER BY\b.*\bLIMIT\b", re.IGNORECASE | re.DOTALL)
+
+def explain(conn: sqlite3.Connection, sql: str, params: tuple = ()) -> list[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+def check_query_plans(conn: sqlite3.Connection, queries: dict[str, tuple[str, tuple]] = HOT_QUERIES) -> list[dict]:
+    """Plans of the hot queries, each flagged ok=False on a full scan or temp sort,
+    or when one of COVERING_QUERIES has to read the table.
+
+    A scan as the outer loop of an ORDER BY ... LIMIT query with no temp sort
+    is allowed: it walks rows in ORDER BY order and stops after LIMIT of them
+    (a first page).
+    """
+    results = []
+    for name, (sql, params) in queries.items():
+        plan = explain(conn, sql, params)
+        sorted_in_temp = any(p.startswith("USE TEMP B-TREE") for p in plan)
+        ordered_limit = _ORDERED_LIMIT.search(sql) is not None and not sorted_in_temp
+        problems = [
+            p
+            for i, p in enumerate(plan)
+            if (_FULL_SCAN.match(p) and not (i == 0 and ordered_limit)) or p.startswith("USE TEMP B-TREE")
+        ]
+        if name in COVERING_QUERIES and not all("COVERING INDEX" in p for p in plan):
+            problems += plan
+        results.append({"query": name, "ok": not problems, "plan": plan})
+    return results
@@ -1,3 +1,4 @@
+-- Baseline schema, applied as migration 1. Later changes go in app/db/migrations.py.
 PRAGMA foreign_keys = ON;
 
 CREATE TABLE IF NOT EXISTS items (
@@ -39,3 +40,47 @@ CREATE TABLE IF NOT EXISTS outfit_items (
   FOREIGN KEY (outfit_id) REFERENCES outfits(id) ON DELETE CASCADE,
   FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE
 );
+
+CREATE INDEX IF NOT EXISTS idx_items_category_formality ON items(category, formality);
+
+-- Bumped on every items write; in-process caches compare against it.
+CREATE TABLE IF NOT EXISTS wardrobe_state (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO wardrobe_state (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_items_insert_version AFTER INSERT ON items
+BEGIN
+  UPDATE wardrobe_state SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_items_update_version AFTER UPDATE ON items
+BEGIN
+  UPDATE wardrobe_state SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_items_delete_version AFTER DELETE ON items
+BEGIN
+  UPDATE wardrobe_state SET version = version + 1 WHERE id = 1;
+END;
+
+-- Background work (e.g. photo detection). ref_id points at the row the job is about.
+CREATE TABLE IF NOT EXISTS jobs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  kind TEXT NOT NULL,
+  ref_id INTEGER,
+  payload TEXT NOT NULL DEFAULT '{}',
+  status TEXT NOT NULL DEFAULT 'pending',   -- pending, running, done, failed
+  attempts INTEGER NOT NULL DEFAULT 0,
+  max_attempts INTEGER NOT NULL DEFAULT 3,
+  last_error TEXT,
+  run_after TEXT NOT NULL DEFAULT (datetime('now')),
+  locked_until TEXT,
+  created_at TEXT NOT NULL DEFAULT (datetime('now')),
+  updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after ON jobs(status, run_after);
+CREATE INDEX IF NOT EXISTS idx_jobs_kind_ref ON jobs(kind, ref_id);
@@ -1,26 +1,54 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 
-from app.db.database import init_db
+from app.db import migrations
+from app.db.database import init_db, pool
+from app.metrics import MetricsMiddleware, render
+from app.services.jobs import worker
+from app.services.uploads import UploadLimitMiddleware
+from app.services.wardrobe import snapshot
 from app.routers.items import router as items_router
 from app.routers.outfits import router as outfits_router
 from app.routers.outfits_ui import router as outfits_ui_router
 from app.routers.ingest_ui import router as ingest_ui_router  # <-- THIS is what you were missing
+from app.routers.thumbs import router as thumbs_router
+from app.templating import templates
 
 app = FastAPI(title="Digital Wardrobe")
+app.add_middleware(UploadLimitMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
-templates = Jinja2Templates(directory="app/templates")
 
 @app.on_event("startup")
 def _startup():
     init_db()
+    worker.start()
+
+@app.on_event("shutdown")
+def _shutdown():
+    worker.stop()
+    pool.close()
 
 @app.get("/health")
 def health():
     return {"ok": True}
 
+@app.get("/health/db")
+def health_db():
+    return {**pool.stats(), "migrations": migrations.last_run}
+
+@app.get("/health/cache")
+def health_cache():
+    return snapshot.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return render({
+        "db_pool": (pool.stats(), pool.STATS_METRICS),
+        "snapshot": (snapshot.stats(), snapshot.STATS_METRICS),
+    })
+
 @app.get("/", response_class=HTMLResponse)
 def home(request: Request):
     return templates.TemplateResponse("home.html", {"request": request, "title": "Home"})
@@ -30,3 +58,4 @@ app.include_router(items_router)
 app.include_router(outfits_router)
 app.include_router(outfits_ui_router)
 app.include_router(ingest_ui_router)
+app.include_router(thumbs_router)
@@ -0,0 +1,280 @@
+import asyncio
+import cProfile
+import contextvars
+import functools
+import inspect
+import io
+import logging
+import pstats
+import re
+import threading
+import time
+from typing import Callable
+
+from fastapi.routing import APIRoute
+
+from app.config import METRICS_ENABLED, METRICS_N_PLUS_ONE, PROFILING_ENABLED
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, labels)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self._series: dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, series):
+                    cumulative += n
+                    lines.append(f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(names, labels + ('+Inf',))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labels, labels)} {series[-1]}")
+        return lines
+
+http_latency = Histogram(
+    "wardrobe_http_request_duration_seconds", "Time to fully answer a request.", ("method", "route", "status")
+)
+sql_latency = Histogram(
+    "wardrobe_sql_statement_duration_seconds", "Statement time, from execute() until its rows are fetched.", ("kind",), SQL_BUCKETS
+)
+sql_n_plus_one = Counter(
+    "wardrobe_sql_n_plus_one_total", "Requests that ran one statement repeatedly (likely N+1).", ("route",)
+)
+engine_latency = Histogram("wardrobe_engine_duration_seconds", "Outfit engine call time.", ("function",))
+
+class RequestStats:
+    """SQL issued on behalf of one request, shared across the threads serving it."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements: dict[str, int] = {}
+
+    def repeated(self) -> tuple[str, int] | None:
+        if not self.statements:
+            return None
+        sql, n = max(self.statements.items(), key=lambda kv: kv[1])
+        return (sql, n) if n >= METRICS_N_PLUS_ONE else None
+
+_request_stats: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar("request_stats", default=None)
+
+_WS_RE = re.compile(r"\s+")
+_COMMENT_RE = re.compile(r"--[^\n]*")
+
+def record_query(sql: str, seconds: float, many: bool = False) -> None:
+    # called by the instrumented connection for every statement
+    text = _WS_RE.sub(" ", _COMMENT_RE.sub("", sql)).strip()
+    kind = text.split(" ", 1)[0].upper() if text else "?"
+    sql_latency.observe(seconds, kind)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.sql_seconds += seconds
+        if not many:  # executemany is already batched
+            stats.statements[text] = stats.statements.get(text, 0) + 1
+
+def timed(name: str) -> Callable:
+    # Decorator: observe call time in wardrobe_engine_duration_seconds.
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                engine_latency.observe(time.perf_counter() - t0, name)
+        return wrapper
+    return decorate if METRICS_ENABLED else (lambda fn: fn)
+
+# --- per-request profiling (X-Profile: 1, when PROFILING_ENABLED) ---
+
+class RequestProfile:
+    # cProfile only sees the thread it is enabled in, so each thread that does
+    # work for the request (event loop, threadpool, db executor) adds its own.
+    def __init__(self):
+        self.profiles: list[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def new(self) -> cProfile.Profile:
+        prof = cProfile.Profile()
+        with self._lock:
+            self.profiles.append(prof)
+        return prof
+
+    def summary(self, limit: int = 40) -> str:
+        out = io.StringIO()
+        profiles = [p for p in self.profiles if p.getstats()]
+        if not profiles:
+            return "no profile data\n"
+        stats = pstats.Stats(*profiles, stream=out)
+        stats.strip_dirs().sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+_request_profile: contextvars.ContextVar[RequestProfile | None] = contextvars.ContextVar("request_profile", default=None)
+# one profiled request at a time: a thread can only run one profiler
+_profile_lock = asyncio.Lock()
+
+def profiled_call(fn: Callable, *args, **kwargs):
+    # Run fn in this thread, under the current request's profiler if it has one.
+    holder = _request_profile.get()
+    if holder is None:
+        return fn(*args, **kwargs)
+    prof = holder.new()
+    prof.enable()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        prof.disable()
+
+class InstrumentedRoute(APIRoute):
+    # Sync endpoints run in the threadpool; wrap them so X-Profile covers that thread.
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if PROFILING_ENABLED and not inspect.iscoroutinefunction(endpoint):
+            original = endpoint
+
+            @functools.wraps(original)
+            def endpoint(*args, **kwargs):
+                return profiled_call(original, *args, **kwargs)
+
+        super().__init__(path, endpoint, **kwargs)
+
+class MetricsMiddleware:
+    """ASGI middleware: latency histogram per route, per-request SQL stats.
+
+    Adds X-Query-Count / X-Query-Time-Ms headers, flags N+1 patterns, and with
+    PROFILING_ENABLED answers requests carrying `X-Profile: 1` with a cProfile
+    summary (text/plain) instead of the normal body.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        if PROFILING_ENABLED and (b"x-profile", b"1") in scope.get("headers", []):
+            async with _profile_lock:
+                await self._handle(scope, receive, send, RequestProfile())
+            return
+        await self._handle(scope, receive, send, None)
+
+    async def _handle(self, scope, receive, send, holder: "RequestProfile | None"):
+        stats = RequestStats()
+        stats_token = _request_stats.set(stats)
+        profile_token = _request_profile.set(holder)
+
+        status = [500]
+        captured: list[dict] = []
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(stats.queries).encode()))
+                headers.append((b"x-query-time-ms", f"{stats.sql_seconds * 1000:.2f}".encode()))
+                message = {**message, "headers": headers}
+            if holder is not None:
+                captured.append(message)
+                return
+            await send(message)
+
+        started = time.perf_counter()
+        loop_prof = holder.new() if holder else None
+        if loop_prof:
+            # also picks up whatever else the event loop runs meanwhile
+            loop_prof.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if loop_prof:
+                loop_prof.disable()
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            http_latency.observe(elapsed, scope["method"], route_path, status[0])
+            repeated = stats.repeated()
+            if repeated:
+                sql_n_plus_one.inc(route_path)
+                log.warning("possible N+1 on %s %s: %dx %s", scope["method"], route_path, repeated[1], repeated[0][:200])
+            _request_stats.reset(stats_token)
+            _request_profile.reset(profile_token)
+
+        if holder is not None:
+            body = holder.summary().encode()
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/plain; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"x-profile-status", str(status[0]).encode()),
+                    (b"x-query-count", str(stats.queries).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+
+def render(extra: dict[str, tuple[dict, dict[str, tuple[str, str]]]]) -> str:
+    """Prometheus text exposition of all metrics plus the stats groups in `extra`.
+
+    extra: prefix -> (stats dict, key -> (type, help)). Counters get a _total
+    suffix; keys without a description are exported as gauges.
+    """
+    lines: list[str] = []
+    for metric in (http_latency, sql_latency, sql_n_plus_one, engine_latency):
+        lines += metric.render()
+    for prefix, (values, described) in extra.items():
+        for key, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                kind, help = described.get(key, ("gauge", f"{prefix} {key}."))
+                name = f"wardrobe_{prefix}_{key}"
+                if kind == "counter" and not name.endswith("_total"):
+                    name += "_total"
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
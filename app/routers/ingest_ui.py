@@ -1,63 +1,21 @@
 from __future__ import annotations
 
-import random
-from pathlib import Path
-from uuid import uuid4
+import asyncio
+import json
+import sqlite3
 
-from fastapi import APIRouter, Request, UploadFile, File
-from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, Depends, Form, Request, UploadFile, File
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 
-from app.db.database import get_conn
+from app.db.database import get_db, run_db
+from app.services import jobs
+from app.services.bulk_ingest import pending_photo_ids
+from app.services.color_utils import hex_to_hsl
+from app.services.uploads import discard_uploads, register_blobs, save_uploads
+from app.templating import templates
+from app.metrics import InstrumentedRoute
 
-router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
-
-UPLOAD_DIR = Path("app/static/uploads")
-
-SLOTS = ["top", "bottom", "shoes", "outerwear"]
-
-def _save_upload(file: UploadFile) -> str | None:
-    if not file or not file.filename:
-        return None
-
-    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-    suffix = Path(file.filename).suffix.lower()
-    safe_name = f"{uuid4().hex}{suffix}"
-    dest = UPLOAD_DIR / safe_name
-
-    with dest.open("wb") as f:
-        f.write(file.file.read())
-
-    return f"/static/uploads/{safe_name}"
-
-def _stub_extract_photo_items(photo_id: int) -> None:
-    # Fake “AI”. Creates 2-4 detected items.
-    possible = SLOTS[:]
-    random.shuffle(possible)
-    k = random.randint(2, 4)
-    chosen = possible[:k]
-
-    sample_hex = ["#111111", "#FFFFFF", "#2D2A32", "#1E3A8A", "#0F766E", "#B91C1C", "#A16207"]
-
-    conn = get_conn()
-    try:
-        # clear any previous detections for this photo
-        conn.execute("DELETE FROM photo_items WHERE photo_id = ?", (photo_id,))
-
-        for cat in chosen:
-            hexv = random.choice(sample_hex)
-            conn.execute(
-                """
-                INSERT INTO photo_items (photo_id, category, slot, bbox_json, extracted_color_hex)
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                (photo_id, cat, cat, None, hexv),
-            )
-
-        conn.commit()
-    finally:
-        conn.close()
+router = APIRouter(route_class=InstrumentedRoute)
 
 def _next_pending_photo_id(conn) -> int | None:
     row = conn.execute(
@@ -65,21 +23,29 @@ def _next_pending_photo_id(conn) -> int | None:
     ).fetchone()
     return int(row["id"]) if row else None
 
+def _detection_status(conn: sqlite3.Connection, photo_id: int) -> dict:
+    job = jobs.latest_job(conn, "detect_photo", photo_id)
+    detected = conn.execute("SELECT COUNT(*) AS n FROM photo_items WHERE photo_id = ?", (photo_id,)).fetchone()["n"]
+    return {
+        "photo_id": photo_id,
+        "status": job["status"] if job else "none",
+        "attempts": job["attempts"] if job else 0,
+        "error": job["last_error"] if job else None,
+        "detected": detected,
+    }
+
 @router.get("/ingest")
-def ingest_home(request: Request):
-    conn = get_conn()
-    try:
-        pid = _next_pending_photo_id(conn)
-        photo = None
-        detected = []
-        if pid is not None:
-            photo = conn.execute("SELECT * FROM closet_photos WHERE id = ?", (pid,)).fetchone()
-            detected_rows = conn.execute(
-                "SELECT * FROM photo_items WHERE photo_id = ? ORDER BY id ASC", (pid,)
-            ).fetchall()
-            detected = [dict(r) for r in detected_rows]
-    finally:
-        conn.close()
+def ingest_home(request: Request, conn: sqlite3.Connection = Depends(get_db)):
+    pid = _next_pending_photo_id(conn)
+    pending = conn.execute("SELECT COUNT(*) AS n FROM closet_photos WHERE decision = 'pending'").fetchone()["n"]
+    photo = None
+    detected = []
+    if pid is not None:
+        photo = conn.execute("SELECT * FROM closet_photos WHERE id = ?", (pid,)).fetchone()
+        detected_rows = conn.execute(
+            "SELECT * FROM photo_items WHERE photo_id = ? ORDER BY id ASC", (pid,)
+        ).fetchall()
+        detected = [dict(r) for r in detected_rows]
 
     return templates.TemplateResponse(
         "ingest.html",
@@ -88,66 +54,141 @@ def ingest_home(request: Request):
             "title": "Ingest",
             "photo": dict(photo) if photo else None,
             "detected": detected,
+            "pending": pending,
         },
     )
 
 @router.post("/ingest/upload")
 async def ingest_upload(request: Request, photos: list[UploadFile] = File(...)):
-    paths: list[str] = []
-    for f in photos:
-        p = _save_upload(f)
-        if p:
-            paths.append(p)
+    saved = await save_uploads(photos)
 
-    conn = get_conn()
-    try:
-        for p in paths:
+    def write(conn: sqlite3.Connection) -> tuple[int, list[int]]:
+        register_blobs(conn, saved)
+
+        # identical photos are stored once; re-uploads link to the existing queue entry
+        queued = 0
+        existing: list[int] = []
+        seen: set[str] = set()
+        for s in saved:
+            if s.path in seen:
+                continue
+            seen.add(s.path)
+            row = conn.execute("SELECT id FROM closet_photos WHERE image_path = ?", (s.path,)).fetchone()
+            if row:
+                existing.append(int(row["id"]))
+                continue
             conn.execute(
                 "INSERT INTO closet_photos (image_path, source, decision) VALUES (?, 'upload', 'pending')",
-                (p,),
+                (s.path,),
             )
+            queued += 1
         conn.commit()
-    finally:
-        conn.close()
+        return queued, existing
+
+    try:
+        queued, existing = await run_db(write)
+    except BaseException:
+        await discard_uploads(saved)
+        raise
 
+    if not queued and len(existing) == 1:
+        return RedirectResponse(url=f"/ingest/{existing[0]}/review", status_code=303)
     return RedirectResponse(url="/ingest", status_code=303)
 
+@router.post("/ingest/bulk")
+def ingest_bulk(
+    request: Request,
+    photo_id: list[int] = Form(default=[]),
+    limit: int = Form(default=0),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    # Accept-all mode: the posted photo ids, or every pending photo (up to limit).
+    # Detection runs on the job worker; the status page follows the job.
+    ids = photo_id or pending_photo_ids(conn, limit or None)
+    job_id = jobs.enqueue(conn, "bulk_ingest", {"photo_ids": ids}, max_attempts=1)
+    conn.commit()
+    jobs.worker.notify()
+    return RedirectResponse(url=f"/ingest/bulk/{job_id}", status_code=303)
+
+def _bulk_job(conn: sqlite3.Connection, job_id: int) -> dict | None:
+    job = jobs.get_job(conn, job_id)
+    return job if job and job["kind"] == "bulk_ingest" else None
+
+@router.get("/ingest/bulk/{job_id}")
+def ingest_bulk_status(request: Request, job_id: int, conn: sqlite3.Connection = Depends(get_db)):
+    job = _bulk_job(conn, job_id)
+    if job is None:
+        return RedirectResponse(url="/ingest", status_code=303)
+    return templates.TemplateResponse("ingest_bulk.html", {"request": request, "title": "Bulk ingest", "job": job})
+
+@router.get("/ingest/bulk/{job_id}/events")
+async def ingest_bulk_events(job_id: int):
+    # Same protocol as /ingest/{photo_id}/events, for a bulk ingest job.
+    async def stream():
+        last = None
+        for _ in range(2400):
+            job = await run_db(_bulk_job, job_id)
+            status = {"job_id": job_id, "status": job["status"] if job else "none"}
+            if status != last:
+                yield f"event: status\ndata: {json.dumps(status)}\n\n"
+                last = status
+            if status["status"] in ("done", "failed", "none"):
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @router.post("/ingest/{photo_id}/reject")
-def ingest_reject(photo_id: int):
-    conn = get_conn()
-    try:
-        conn.execute("UPDATE closet_photos SET decision = 'rejected' WHERE id = ?", (photo_id,))
-        conn.commit()
-    finally:
-        conn.close()
+def ingest_reject(photo_id: int, conn: sqlite3.Connection = Depends(get_db)):
+    conn.execute("UPDATE closet_photos SET decision = 'rejected' WHERE id = ?", (photo_id,))
+    conn.commit()
     return RedirectResponse(url="/ingest", status_code=303)
 
 @router.post("/ingest/{photo_id}/accept")
-def ingest_accept(photo_id: int):
-    conn = get_conn()
-    try:
-        conn.execute("UPDATE closet_photos SET decision = 'accepted' WHERE id = ?", (photo_id,))
-        conn.commit()
-    finally:
-        conn.close()
+def ingest_accept(photo_id: int, conn: sqlite3.Connection = Depends(get_db)):
+    photo = conn.execute("SELECT image_path FROM closet_photos WHERE id = ?", (photo_id,)).fetchone()
+    if not photo:
+        return RedirectResponse(url="/ingest", status_code=303)
+
+    # detection runs in the background; the review page waits for it
+    conn.execute("UPDATE closet_photos SET decision = 'accepted' WHERE id = ?", (photo_id,))
+    jobs.enqueue(conn, "detect_photo", {"photo_id": photo_id, "image_path": photo["image_path"]}, ref_id=photo_id)
+    conn.commit()
+    jobs.worker.notify()
 
-    _stub_extract_photo_items(photo_id)
     return RedirectResponse(url=f"/ingest/{photo_id}/review", status_code=303)
 
+@router.get("/ingest/{photo_id}/status")
+def ingest_status(photo_id: int, conn: sqlite3.Connection = Depends(get_db)):
+    return JSONResponse(_detection_status(conn, photo_id))
+
+@router.get("/ingest/{photo_id}/events")
+async def ingest_events(photo_id: int):
+    # Server-sent events: one "status" event per change until detection settles.
+    async def stream():
+        last = None
+        for _ in range(240):
+            status = await run_db(_detection_status, photo_id)
+            if status != last:
+                yield f"event: status\ndata: {json.dumps(status)}\n\n"
+                last = status
+            if status["status"] in ("done", "failed", "none"):
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @router.get("/ingest/{photo_id}/review")
-def ingest_review(request: Request, photo_id: int):
-    conn = get_conn()
-    try:
-        photo = conn.execute("SELECT * FROM closet_photos WHERE id = ?", (photo_id,)).fetchone()
-        if not photo:
-            return RedirectResponse(url="/ingest", status_code=303)
+def ingest_review(request: Request, photo_id: int, conn: sqlite3.Connection = Depends(get_db)):
+    photo = conn.execute("SELECT * FROM closet_photos WHERE id = ?", (photo_id,)).fetchone()
+    if not photo:
+        return RedirectResponse(url="/ingest", status_code=303)
 
-        detected_rows = conn.execute(
-            "SELECT * FROM photo_items WHERE photo_id = ? ORDER BY id ASC", (photo_id,)
-        ).fetchall()
-        detected = [dict(r) for r in detected_rows]
-    finally:
-        conn.close()
+    detected_rows = conn.execute(
+        "SELECT * FROM photo_items WHERE photo_id = ? ORDER BY id ASC", (photo_id,)
+    ).fetchall()
+    detected = [dict(r) for r in detected_rows]
+    job = jobs.latest_job(conn, "detect_photo", photo_id)
 
     return templates.TemplateResponse(
         "ingest_review.html",
@@ -156,6 +197,7 @@ def ingest_review(request: Request, photo_id: int):
             "title": "Review",
             "photo": dict(photo),
             "detected": detected,
+            "job": job,
         },
     )
 
@@ -163,19 +205,17 @@ def ingest_review(request: Request, photo_id: int):
 async def ingest_finalize(photo_id: int, request: Request):
     form = await request.form()
 
-    # which detections did user pick?
-    # checkboxes named detect_{id} = "on"
-    conn = get_conn()
-    try:
+    def write(conn: sqlite3.Connection) -> bool:
+        # which detections did user pick?
+        # checkboxes named detect_{id} = "on"
         photo = conn.execute("SELECT * FROM closet_photos WHERE id = ?", (photo_id,)).fetchone()
         if not photo:
-            return RedirectResponse(url="/ingest", status_code=303)
+            return False
 
         detections = conn.execute(
             "SELECT * FROM photo_items WHERE photo_id = ? ORDER BY id ASC", (photo_id,)
         ).fetchall()
 
-        created = 0
         for d in detections:
             did = d["id"]
             if not form.get(f"detect_{did}"):
@@ -185,6 +225,7 @@ async def ingest_finalize(photo_id: int, request: Request):
             category = str(form.get(f"category_{did}", d["category"] or "")).strip() or "top"
             color_primary = str(form.get(f"color_primary_{did}", "")).strip() or "unknown"
             color_hex = str(form.get(f"color_hex_{did}", "")).strip() or None
+            color_h, color_s, color_l = (hex_to_hsl(color_hex) if color_hex else None) or (None, None, None)
 
             # For now, we reuse the same photo as item image. Later you’ll crop to the detected bbox.
             image_path = photo["image_path"]
@@ -195,18 +236,18 @@ async def ingest_finalize(photo_id: int, request: Request):
 
             cur = conn.execute(
                 """
-                INSERT INTO items (name, category, color_primary, color_secondary, warmth, formality, notes, image_path, color_hex)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO items (name, category, color_primary, color_secondary, warmth, formality, notes, image_path, color_hex, color_h, color_s, color_l)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """,
-                (name, category, color_primary, None, warmth, formality, notes, image_path, color_hex),
+                (name, category, color_primary, None, warmth, formality, notes, image_path, color_hex, color_h, color_s, color_l),
             )
             item_id = cur.lastrowid
 
             conn.execute("UPDATE photo_items SET item_id = ? WHERE id = ?", (item_id, did))
-            created += 1
 
         conn.commit()
-    finally:
-        conn.close()
+        return True
 
+    if not await run_db(write):
+        return RedirectResponse(url="/ingest", status_code=303)
     return RedirectResponse(url="/items", status_code=303)
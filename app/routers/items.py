@@ -1,39 +1,90 @@
-from fastapi import APIRouter, Request, UploadFile, File
-from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
-from pathlib import Path
-from uuid import uuid4
-
-from app.db.database import get_conn
-from app.services.color_utils import hex_to_hsl
-
-router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
-UPLOAD_DIR = Path("app/static/uploads")
-
-def _save_upload(file: UploadFile) -> str | None:
-    if not file or not file.filename:
-        return None
-
-    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-    suffix = Path(file.filename).suffix.lower()
-    safe_name = f"{uuid4().hex}{suffix}"
-    dest = UPLOAD_DIR / safe_name
+import sqlite3
+from urllib.parse import urlencode
 
-    with dest.open("wb") as f:
-        f.write(file.file.read())
+from fastapi import APIRouter, Depends, Request, UploadFile, File
+from fastapi.responses import RedirectResponse
 
-    return f"/static/uploads/{safe_name}"
+from app.db.database import get_db, run_db
+from app.services.color_utils import COLOR_FAMILIES, hex_to_hsl
+from app.services.listing import ITEMS_PAGE_SIZE, load_items_page
+from app.services.search import SEARCH_LIMIT, search_items
+from app.services.uploads import discard_uploads, register_blobs, save_upload
+from app.templating import templates
+from app.metrics import InstrumentedRoute
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+FILTER_FIELDS = ("category", "formality_min", "formality_max", "warmth", "color_family", "tag")
+INT_FILTERS = ("formality_min", "formality_max", "warmth")
+
+def _filters_from_query(request: Request) -> dict:
+    # the filter form submits empty strings for "any"; drop those and bad numbers
+    filters = {}
+    for field in FILTER_FIELDS:
+        value = request.query_params.get(field, "").strip()
+        if not value:
+            continue
+        if field in INT_FILTERS:
+            try:
+                filters[field] = int(value)
+            except ValueError:
+                continue
+        else:
+            filters[field] = value
+    return filters
 
 @router.get("/items")
-def items_list(request: Request):
-    conn = get_conn()
-    try:
-        rows = conn.execute("SELECT * FROM items ORDER BY id DESC").fetchall()
-        items = [dict(r) for r in rows]
-    finally:
-        conn.close()
-    return templates.TemplateResponse("items_list.html", {"request": request, "items": items, "title": "Wardrobe"})
+def items_list(request: Request, before: int | None = None, conn: sqlite3.Connection = Depends(get_db)):
+    filters = _filters_from_query(request)
+    items, next_before = load_items_page(conn, before=before, **filters)
+    next_url = f"/items?{urlencode({**filters, 'before': next_before})}" if next_before else None
+    return templates.TemplateResponse(
+        "items_list.html",
+        {
+            "request": request,
+            "items": items,
+            "filters": filters,
+            "color_families": COLOR_FAMILIES,
+            "next_url": next_url,
+            "title": "Wardrobe",
+        },
+    )
+
+@router.get("/api/items")
+def api_items(
+    before: int | None = None,
+    limit: int = ITEMS_PAGE_SIZE,
+    category: str | None = None,
+    formality_min: int | None = None,
+    formality_max: int | None = None,
+    warmth: int | None = None,
+    color_family: str | None = None,
+    tag: str | None = None,
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    items, next_before = load_items_page(
+        conn,
+        before=before,
+        limit=limit,
+        category=category,
+        formality_min=formality_min,
+        formality_max=formality_max,
+        warmth=warmth,
+        color_family=color_family,
+        tag=tag,
+    )
+    return {"items": items, "next_before": next_before}
+
+@router.get("/items/search")
+def items_search(request: Request, q: str = "", conn: sqlite3.Connection = Depends(get_db)):
+    results = search_items(conn, q)
+    return templates.TemplateResponse(
+        "items_search.html", {"request": request, "q": q, "results": results, "title": "Search"}
+    )
+
+@router.get("/api/search")
+def api_search(q: str = "", limit: int = SEARCH_LIMIT, conn: sqlite3.Connection = Depends(get_db)):
+    return {"q": q, "items": search_items(conn, q, limit=limit)}
 
 @router.get("/items/new")
 def items_new_form(request: Request):
@@ -55,10 +106,12 @@ async def item_new_submit(request: Request, image: UploadFile | None = File(defa
     hsl = hex_to_hsl(color_hex) if color_hex else None
     color_h, color_s, color_l = (hsl if hsl else (None, None, None))
 
-    image_path = _save_upload(image) if image and image.filename else None
+    saved = await save_upload(image)
+    image_path = saved.path if saved else None
 
-    conn = get_conn()
-    try:
+    def write(conn: sqlite3.Connection) -> None:
+        if saved:
+            register_blobs(conn, [saved])
         conn.execute(
             """
             INSERT INTO items (name, category, color_primary, color_secondary, warmth, formality, notes, image_path, color_hex, color_h, color_s, color_l)
@@ -67,21 +120,21 @@ async def item_new_submit(request: Request, image: UploadFile | None = File(defa
             (name, category, color_primary, color_secondary, warmth, formality, notes, image_path, color_hex, color_h, color_s, color_l),
         )
         conn.commit()
-    finally:
-        conn.close()
+
+    try:
+        await run_db(write)
+    except BaseException:
+        await discard_uploads([saved] if saved else [])
+        raise
 
     return RedirectResponse(url="/items", status_code=303)
 
 @router.get("/items/{item_id}/edit")
-def item_edit_form(request: Request, item_id: int):
-    conn = get_conn()
-    try:
-        row = conn.execute("SELECT * FROM items WHERE id = ?", (item_id,)).fetchone()
-        if row is None:
-            return RedirectResponse(url="/items", status_code=303)
-        item = dict(row)
-    finally:
-        conn.close()
+def item_edit_form(request: Request, item_id: int, conn: sqlite3.Connection = Depends(get_db)):
+    row = conn.execute("SELECT * FROM items WHERE id = ?", (item_id,)).fetchone()
+    if row is None:
+        return RedirectResponse(url="/items", status_code=303)
+    item = dict(row)
 
     return templates.TemplateResponse("item_edit.html", {"request": request, "item": item, "title": "Edit Item"})
 
@@ -102,10 +155,13 @@ async def item_edit_submit(item_id: int, request: Request, image: UploadFile | N
     hsl = hex_to_hsl(color_hex) if color_hex else None
     color_h, color_s, color_l = (hsl if hsl else (None, None, None))
 
-    new_image_path = _save_upload(image) if image and image.filename else None
+    saved = await save_upload(image)
+    new_image_path = saved.path if saved else None
+
+    def write(conn: sqlite3.Connection) -> None:
+        if saved:
+            register_blobs(conn, [saved])
 
-    conn = get_conn()
-    try:
         old = conn.execute("SELECT image_path FROM items WHERE id = ?", (item_id,)).fetchone()
         old_image_path = old["image_path"] if old else None
         final_image_path = new_image_path or old_image_path
@@ -121,17 +177,17 @@ async def item_edit_submit(item_id: int, request: Request, image: UploadFile | N
              final_image_path, color_hex, color_h, color_s, color_l, item_id),
         )
         conn.commit()
-    finally:
-        conn.close()
+
+    try:
+        await run_db(write)
+    except BaseException:
+        await discard_uploads([saved] if saved else [])
+        raise
 
     return RedirectResponse(url="/items", status_code=303)
 
 @router.post("/items/{item_id}/delete")
-def item_delete(item_id: int):
-    conn = get_conn()
-    try:
-        conn.execute("DELETE FROM items WHERE id = ?", (item_id,))
-        conn.commit()
-    finally:
-        conn.close()
+def item_delete(item_id: int, conn: sqlite3.Connection = Depends(get_db)):
+    conn.execute("DELETE FROM items WHERE id = ?", (item_id,))
+    conn.commit()
     return RedirectResponse(url="/items", status_code=303)
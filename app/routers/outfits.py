@@ -1,19 +1,118 @@
-from fastapi import APIRouter, Request
-from fastapi.responses import JSONResponse
+import json
+import sqlite3
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 
-from app.db.database import get_conn
-from app.services.outfit_engine import generate_outfit
+from app.db.database import get_db
+from app.services.history import HISTORY_PAGE_SIZE, load_history
+from app.services.outfit_engine import ALL_SLOTS, generate_outfit, generate_outfits
+from app.services.outfit_solver import PAIR_TERMS, RECENCY_WINDOW, UNARY_TERMS, solve_outfits
+from app.services.usage import load_pairings, recent_wear
+from app.services.wardrobe import snapshot
+from app.metrics import InstrumentedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
+
+BATCH_MAX_REQUESTS = 500
+BATCH_MAX_COUNT = 50
+
+class OutfitRequest(BaseModel):
+    context: str = "office"
+    count: int = Field(default=1, ge=1, le=BATCH_MAX_COUNT)
+    locked: dict[str, int] = Field(default_factory=dict)  # slot -> item id
+    seed: int | None = None
+    ranked: bool = False
+
+class OutfitBatch(BaseModel):
+    requests: list[OutfitRequest] = Field(max_length=BATCH_MAX_REQUESTS)
+
+class SolveRequest(BaseModel):
+    context: str = "office"
+    count: int = Field(default=3, ge=1, le=BATCH_MAX_COUNT)
+    warmth: int | None = Field(default=None, ge=1, le=5)  # target warmth of the pieces
+    weights: dict[str, float] = Field(default_factory=dict)  # term name -> weight, over the defaults
+    locked: dict[str, int] = Field(default_factory=dict)  # slot -> item id
+
+def _mismatched_slots(locked: dict[str, int], by_id: dict[int, dict]) -> dict[str, int]:
+    # slot -> item id, for known items locked into another category's known slot
+    return {
+        slot: sid
+        for slot, sid in locked.items()
+        if slot in ALL_SLOTS and sid in by_id and by_id[sid]["category"] != slot
+    }
 
 @router.post("/api/outfits/generate")
-def generate(context: str = "office"):
-    conn = get_conn()
-    try:
-        rows = conn.execute("SELECT * FROM items").fetchall()
-        items = [dict(r) for r in rows]
-    finally:
-        conn.close()
-
-    outfit = generate_outfit(items, context)
+def generate(context: str = "office", seed: int | None = None, conn: sqlite3.Connection = Depends(get_db)):
+    pool = snapshot.pool(conn, context)
+    last_worn = recent_wear(conn, RECENCY_WINDOW)
+
+    outfit = generate_outfit(pool, context, seed=seed, last_worn=last_worn)
     return JSONResponse(outfit)
+
+@router.post("/api/outfits/solve")
+def solve(req: SolveRequest, conn: sqlite3.Connection = Depends(get_db)):
+    pool = snapshot.pool(conn, req.context)
+    by_id = {it["id"]: it for it in snapshot.items_by_id(conn, sorted(set(req.locked.values())))}
+    error = {
+        "unknown_slots": sorted(s for s in req.locked if s not in ALL_SLOTS),
+        "unknown_item_ids": sorted(sid for sid in req.locked.values() if sid not in by_id),
+        "unknown_terms": sorted(t for t in req.weights if t not in UNARY_TERMS and t not in PAIR_TERMS),
+    }
+    if any(error.values()):
+        return JSONResponse({"error": error}, status_code=400)
+    mismatched = _mismatched_slots(req.locked, by_id)
+    if mismatched:
+        return JSONResponse({"error": {"mismatched_slots": mismatched}}, status_code=422)
+
+    locked = {slot: by_id[sid] for slot, sid in req.locked.items()}
+    last_worn = recent_wear(conn, RECENCY_WINDOW) if req.weights.get("recency", 1) else {}
+    pairings = load_pairings(conn) if req.weights.get("pairing", 1) else {}
+    outfits = solve_outfits(
+        pool,
+        k=req.count,
+        warmth=req.warmth,
+        last_worn=last_worn,
+        pairings=pairings,
+        weights=req.weights,
+        locked=locked,
+    )
+    return {"context": req.context, "outfits": outfits}
+
+@router.get("/api/history")
+def history(before: int | None = None, limit: int = HISTORY_PAGE_SIZE, conn: sqlite3.Connection = Depends(get_db)):
+    outfits, next_before = load_history(conn, before=before, limit=limit)
+    return {"outfits": outfits, "next_before": next_before}
+
+@router.post("/api/outfits/batch")
+def generate_batch(batch: OutfitBatch, conn: sqlite3.Connection = Depends(get_db)):
+    # Everything that touches the database happens before streaming starts;
+    # the stream itself only walks the cached pools.
+    pools = snapshot.pools(conn, {r.context for r in batch.requests})
+    locked_ids = {sid for r in batch.requests for sid in r.locked.values()}
+    by_id = {it["id"]: it for it in snapshot.items_by_id(conn, sorted(locked_ids))}
+    mismatched = [
+        {"request": i, "mismatched_slots": bad}
+        for i, r in enumerate(batch.requests)
+        if (bad := _mismatched_slots(r.locked, by_id))
+    ]
+    if mismatched:
+        return JSONResponse({"error": mismatched}, status_code=422)
+    last_worn = recent_wear(conn, RECENCY_WINDOW)
+
+    def lines():
+        for i, r in enumerate(batch.requests):
+            bad_slots = sorted(s for s in r.locked if s not in ALL_SLOTS)
+            missing = sorted(sid for sid in r.locked.values() if sid not in by_id)
+            if bad_slots or missing:
+                error = {"unknown_slots": bad_slots, "unknown_item_ids": missing}
+                yield json.dumps({"request": i, "context": r.context, "error": error}) + "\n"
+                continue
+
+            locked = {slot: by_id[sid] for slot, sid in r.locked.items()}
+            outfits = generate_outfits(
+                pools[r.context], r.context, k=r.count, seed=r.seed, ranked=r.ranked, locked=locked, last_worn=last_worn
+            )
+            yield json.dumps({"request": i, "context": r.context, "outfits": outfits}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
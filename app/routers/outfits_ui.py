@@ -1,13 +1,18 @@
 import random
-from fastapi import APIRouter, Request
+import sqlite3
+from fastapi import APIRouter, Depends, Request
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
 
-from app.db.database import get_conn
-from app.services.outfit_engine import generate_outfits, SLOTS
+from app.db.database import get_db, run_db
+from app.services.history import load_history
+from app.services.outfit_engine import SLOTS, fill_outfit, step_slot
+from app.services.outfit_solver import RECENCY_WINDOW
+from app.services.usage import recent_wear, record_outfit_usage
+from app.services.wardrobe import snapshot
+from app.templating import templates
+from app.metrics import InstrumentedRoute
 
-router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
+router = APIRouter(route_class=InstrumentedRoute)
 
 @router.get("/outfits")
 def outfits_page(
@@ -21,13 +26,13 @@ def outfits_page(
     bottom_id: int | None = None,
     shoes_id: int | None = None,
     outerwear_id: int | None = None,
+    top_rank: int = 0,
+    bottom_rank: int = 0,
+    shoes_rank: int = 0,
+    outerwear_rank: int = 0,
+    conn: sqlite3.Connection = Depends(get_db),
 ):
-    conn = get_conn()
-    try:
-        rows = conn.execute("SELECT * FROM items").fetchall()
-        items = [dict(r) for r in rows]
-    finally:
-        conn.close()
+    pool = snapshot.pool(conn, context)
 
     # Parse locked slots
     locked_set = set()
@@ -50,41 +55,30 @@ def outfits_page(
         "shoes": shoes_id,
         "outerwear": outerwear_id,
     }
+    # how far down each slot's ranked candidates the current pick sits
+    ranks = {"top": top_rank, "bottom": bottom_rank, "shoes": shoes_rank, "outerwear": outerwear_rank}
 
-    by_id = {it["id"]: it for it in items}
-
-    # Start with selected ids if present, else pick something reasonable
-    # We generate a baseline outfit, then overlay selections, then apply shuffle/reroll rules
-    base_list = generate_outfits(items, context=context, k=1)
-    outfit = base_list[0] if base_list else {}
-
-    # Overlay selected ids into outfit, these act as "current state"
-    for slot, sid in selected_ids.items():
-        if sid and sid in by_id:
-            outfit[slot] = by_id[sid]
-
-    # Helper to choose a random item for a slot
-    def pick_for_slot(slot: str) -> dict | None:
-        options = [it for it in items if it["category"] == slot]
-        if not options:
-            return None
-        # avoid picking the exact same id when possible
-        current = outfit.get(slot)
-        if current and len(options) > 1:
-            options = [x for x in options if x["id"] != current.get("id")]
-        return random.choice(options)
+    # selections made under another context may fall outside the pool, so look
+    # them up by id (from the snapshot) rather than in the candidates
+    by_id = {it["id"]: it for it in snapshot.items_by_id(conn, [sid for sid in selected_ids.values() if sid])}
+    outfit = {slot: by_id[sid] for slot, sid in selected_ids.items() if sid in by_id}
+
+    # Empty slots get their best match against what is already chosen,
+    # passing over pieces worn in the last few saved outfits
+    outfit = fill_outfit(pool, outfit, locked_set, last_worn=recent_wear(conn, RECENCY_WINDOW), ranks=ranks)
 
     # Apply shuffle or reroll, but only on unlocked slots
     if shuffle == 1:
         for slot in SLOTS:
             if slot in locked_set:
                 continue
-            picked = pick_for_slot(slot)
-            if picked:
-                outfit[slot] = picked
+            options = pool.by_category.get(slot)
+            if not options:
+                continue
+            outfit[slot], ranks[slot] = step_slot(pool, outfit, slot, random.randrange(len(options)), locked_set)
     elif reroll in SLOTS:
         if reroll not in locked_set:
-            picked = pick_for_slot(reroll)
+            picked, ranks[reroll] = step_slot(pool, outfit, reroll, ranks[reroll] + 1, locked_set)
             if picked:
                 outfit[reroll] = picked
 
@@ -97,6 +91,7 @@ def outfits_page(
             "request": request,
             "context": context,
             "outfit": outfit,
+            "ranks": ranks,
             "slots": SLOTS,
             "locked": locked_str,
             "locked_set": locked_set,
@@ -119,9 +114,9 @@ async def outfits_save(request: Request):
             except ValueError:
                 pass
 
-    conn = get_conn()
-    try:
-        locked_slots = str(form.get("locked", "")).strip()
+    locked_slots = str(form.get("locked", "")).strip()
+
+    def write(conn: sqlite3.Connection) -> None:
         cur = conn.execute(
             "INSERT INTO outfits (context, locked_slots) VALUES (?, ?)",
             (context, locked_slots),
@@ -133,34 +128,19 @@ async def outfits_save(request: Request):
                 "INSERT INTO outfit_items (outfit_id, item_id, slot) VALUES (?, ?, ?)",
                 (outfit_id, item_id, slot),
             )
+        record_outfit_usage(conn, outfit_id, slot_ids.values())
 
         conn.commit()
-    finally:
-        conn.close()
+
+    await run_db(write)
 
     return RedirectResponse(url=f"/outfits?context={context}", status_code=303)
 
 @router.get("/history")
-def history_page(request: Request):
-    conn = get_conn()
-    try:
-        outfit_rows = conn.execute(
-            "SELECT id, context, created_at, locked_slots FROM outfits ORDER BY id DESC LIMIT 50"
-        ).fetchall()
-
-        outfits = []
-        for o in outfit_rows:
-            items = conn.execute(
-                """
-                SELECT oi.slot, i.*
-                FROM outfit_items oi
-                JOIN items i ON i.id = oi.item_id
-                WHERE oi.outfit_id = ?
-                """,
-                (o["id"],),
-            ).fetchall()
-            outfits.append({"meta": dict(o), "items": [dict(r) for r in items]})
-    finally:
-        conn.close()
-
-    return templates.TemplateResponse("history.html", {"request": request, "outfits": outfits, "title": "History"})
+def history_page(request: Request, before: int | None = None, conn: sqlite3.Connection = Depends(get_db)):
+    outfits, next_before = load_history(conn, before=before)
+
+    return templates.TemplateResponse(
+        "history.html",
+        {"request": request, "outfits": outfits, "next_before": next_before, "title": "History"},
+    )
\ No newline at end of file
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import FileResponse, RedirectResponse, Response
+
+from app.services import thumbnails
+from app.services.thumbnails import THUMB_WIDTHS, ensure_thumbnail, source_path, thumb_etag
+from app.metrics import InstrumentedRoute
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+CACHE_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+@router.get("/thumbs/{width}/{name}")
+def thumb(request: Request, width: int, name: str):
+    source = source_path(name)
+    if width not in THUMB_WIDTHS or source is None:
+        return Response(status_code=404)
+
+    if thumbnails.Image is None:
+        return RedirectResponse(url=f"/static/uploads/{name}", status_code=307)
+
+    etag = thumb_etag(name, width)
+    headers = {**CACHE_HEADERS, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    try:
+        path = ensure_thumbnail(source, width)
+    except OSError:
+        # not a decodable image; fall back to the original
+        return RedirectResponse(url=f"/static/uploads/{name}", status_code=307)
+    return FileResponse(path, media_type=f"image/{thumbnails.THUMB_FORMAT}", headers=headers)
@@ -0,0 +1,118 @@
+import sqlite3
+import time
+
+from app.services.color_utils import hex_to_hsl
+from app.services.detection import detect_photo_job
+from app.services.jobs import JobWorker, worker
+
+BULK_BATCH_SIZE = 50
+
+def pending_photo_ids(conn: sqlite3.Connection, limit: int | None = None) -> list[int]:
+    rows = conn.execute(
+        "SELECT id FROM closet_photos WHERE decision = 'pending' ORDER BY id ASC LIMIT ?",
+        (-1 if limit is None else limit,),
+    ).fetchall()
+    return [int(r["id"]) for r in rows]
+
+def bulk_ingest(
+    conn: sqlite3.Connection,
+    photo_ids: list[int],
+    batch_size: int = BULK_BATCH_SIZE,
+    runner: JobWorker | None = None,
+    commit: bool = True,
+) -> dict:
+    """Accept pending photos, detect in batches and add every detection as an item.
+
+    Detection runs on the job worker's process pool, batch_size photos at a
+    time; all database writes then happen in one transaction, for the photos
+    that are still pending by then (others are reported as skipped). With
+    commit=False that transaction is left open for the caller to finish.
+    """
+    runner = runner or worker
+    started = time.perf_counter()
+    photos: list[sqlite3.Row] = []
+    for i in range(0, len(photo_ids), 500):
+        chunk = photo_ids[i:i + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        photos += conn.execute(
+            f"SELECT id, image_path FROM closet_photos WHERE decision = 'pending' AND id IN ({placeholders}) ORDER BY id",
+            tuple(chunk),
+        ).fetchall()
+
+    payloads = [{"photo_id": p["id"], "image_path": p["image_path"]} for p in photos]
+    detections: list[list[dict]] = []
+    for i in range(0, len(payloads), batch_size):
+        batch = payloads[i:i + batch_size]
+        chunksize = max(1, len(batch) // max(1, runner.processes))
+        detections += runner.map(detect_photo_job, batch, chunksize=chunksize)
+    detected_at = time.perf_counter()
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Another run, or a manual accept/reject, may have decided some of these
+        # photos while detection ran; only write the ones still pending.
+        still_pending = set()
+        for i in range(0, len(photos), 500):
+            chunk = [p["id"] for p in photos[i:i + 500]]
+            placeholders = ", ".join("?" for _ in chunk)
+            still_pending.update(
+                r["id"]
+                for r in conn.execute(
+                    f"SELECT id FROM closet_photos WHERE decision = 'pending' AND id IN ({placeholders})",
+                    tuple(chunk),
+                )
+            )
+        written = [(p, found) for p, found in zip(photos, detections) if p["id"] in still_pending]
+
+        found_rows = [(photo, d) for photo, found in written for d in found]
+        item_rows = []
+        for photo, d in found_rows:
+            color_hex = d["extracted_color_hex"]
+            color_h, color_s, color_l = hex_to_hsl(color_hex) or (None, None, None)
+            item_rows.append((
+                f"Detected {d['category']}", d["category"], "unknown", 3, 3,
+                photo["image_path"], color_hex, color_h, color_s, color_l,
+            ))
+        # We hold the write lock, so every id above the current maximum is one
+        # of ours, handed out in insert order.
+        last_id = conn.execute("SELECT coalesce(max(id), 0) FROM items").fetchone()[0]
+        conn.executemany(
+            """
+            INSERT INTO items (name, category, color_primary, warmth, formality, image_path, color_hex, color_h, color_s, color_l)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            item_rows,
+        )
+        item_ids = [r[0] for r in conn.execute("SELECT id FROM items WHERE id > ? ORDER BY id", (last_id,))]
+        link_rows = [
+            (photo["id"], d["category"], d["slot"], d["bbox_json"], d["extracted_color_hex"], item_id)
+            for (photo, d), item_id in zip(found_rows, item_ids)
+        ]
+        items = len(item_ids)
+
+        ids = [(p["id"],) for p, _ in written]
+        conn.executemany("DELETE FROM photo_items WHERE photo_id = ?", ids)
+        conn.executemany(
+            """
+            INSERT INTO photo_items (photo_id, category, slot, bbox_json, extracted_color_hex, item_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            link_rows,
+        )
+        conn.executemany("UPDATE closet_photos SET decision = 'accepted' WHERE id = ?", ids)
+        if commit:
+            conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    elapsed = time.perf_counter() - started
+    return {
+        "photos": len(written),
+        "skipped": len(photos) - len(written),
+        "items": items,
+        "detect_seconds": round(detected_at - started, 3),
+        "write_seconds": round(elapsed - (detected_at - started), 3),
+        "seconds": round(elapsed, 3),
+        "photos_per_second": round(len(written) / elapsed, 1) if elapsed > 0 else None,
+    }
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+try:
+    import numpy as np
+    from PIL import Image, ImageOps
+except ImportError:  # optional: callers fall back when extraction is unavailable
+    np = None
+    Image = None
+
+from app.services.color_utils import rgb_to_hsl
+
+EXTRACT_SIZE = 64          # longest side after downsampling
+KMEANS_K = 5
+KMEANS_ITERS = 8
+# without a bbox, look at the middle of the photo rather than the background
+DEFAULT_REGION = (0.2, 0.2, 0.8, 0.8)
+CACHE_SIZE = 2048
+
+_cache: OrderedDict[tuple, dict] = OrderedDict()
+_cache_lock = threading.Lock()
+
+def available() -> bool:
+    return np is not None and Image is not None
+
+def parse_bbox(bbox_json: str | None) -> tuple[float, float, float, float] | None:
+    # bbox_json: [x0, y0, x1, y1] as fractions of the photo's width/height
+    if not bbox_json:
+        return None
+    try:
+        x0, y0, x1, y1 = (float(v) for v in json.loads(bbox_json))
+    except (TypeError, ValueError):
+        return None
+    x0, x1 = sorted((min(max(x0, 0.0), 1.0), min(max(x1, 0.0), 1.0)))
+    y0, y1 = sorted((min(max(y0, 0.0), 1.0), min(max(y1, 0.0), 1.0)))
+    if x1 - x0 <= 0 or y1 - y0 <= 0:
+        return None
+    return (x0, y0, x1, y1)
+
+def _image_digest(path: Path) -> str:
+    # uploads are named by content hash; other files are hashed here
+    if len(path.stem) == 64 and all(c in "0123456789abcdef" for c in path.stem):
+        return path.stem
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+    return h.hexdigest()
+
+def load_pixels(path: Path, region: tuple[float, float, float, float]):
+    with Image.open(path) as img:
+        # decode JPEGs at a reduced scale; we only need a few thousand pixels
+        scale = max(1.0 / (region[2] - region[0]), 1.0 / (region[3] - region[1]))
+        img.draft("RGB", (int(EXTRACT_SIZE * scale), int(EXTRACT_SIZE * scale)))
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        w, h = img.size
+        box = (int(region[0] * w), int(region[1] * h), max(int(region[2] * w), 1), max(int(region[3] * h), 1))
+        img = img.crop(box)
+        img.thumbnail((EXTRACT_SIZE, EXTRACT_SIZE), Image.BILINEAR)
+        return np.asarray(img, dtype=np.float32).reshape(-1, 3)
+
+def kmeans_dominant(pixels, k: int = KMEANS_K, iters: int = KMEANS_ITERS) -> tuple[int, int, int]:
+    # Lloyd's k-means, fully vectorized; the largest cluster's centre wins.
+    # Centres start on luminance quantiles, so results are deterministic.
+    k = min(k, len(pixels))
+    lum = pixels @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    order = np.argsort(lum)
+    centers = pixels[order[((np.arange(k) + 0.5) * len(pixels) / k).astype(int)]].copy()
+
+    for _ in range(iters):
+        dist = ((pixels[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = dist.argmin(axis=1)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.stack([np.bincount(labels, weights=pixels[:, c], minlength=k) for c in range(3)], axis=1)
+        moved = counts > 0
+        new_centers = centers.copy()
+        new_centers[moved] = sums[moved] / counts[moved, None]
+        if np.allclose(new_centers, centers, atol=0.5):
+            centers = new_centers
+            break
+        centers = new_centers
+
+    dist = ((pixels[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    counts = np.bincount(dist.argmin(axis=1), minlength=k)
+    r, g, b = (int(round(v)) for v in np.clip(centers[int(counts.argmax())], 0, 255))
+    return (r, g, b)
+
+def dominant_color(path: Path, bbox_json: str | None = None) -> dict | None:
+    """Dominant colour of a photo (or its bbox crop): {"hex", "h", "s", "l"}.
+
+    Returns None when Pillow/numpy are missing or the file is not an image.
+    Results are cached per (image content hash, region).
+    """
+    if not available():
+        return None
+    region = parse_bbox(bbox_json) or DEFAULT_REGION
+    try:
+        key = (_image_digest(path), region)
+    except OSError:
+        return None
+
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    try:
+        pixels = load_pixels(path, region)
+    except OSError:
+        return None
+    if len(pixels) == 0:
+        return None
+    r, g, b = kmeans_dominant(pixels)
+    h, s, l = rgb_to_hsl(r, g, b)
+    result = {"hex": f"#{r:02X}{g:02X}{b:02X}", "h": h, "s": s, "l": l}
+
+    with _cache_lock:
+        _cache[key] = result
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
@@ -1,4 +1,29 @@
 import colorsys
+import re
+
+try:
+    import numpy as np
+except ImportError:  # optional: hex_to_hsl_batch falls back to the scalar path
+    np = None
+
+# values of the items.color_family generated column (see migrations._engine_indexes)
+COLOR_FAMILIES = ("neutral", "red", "orange", "yellow", "green", "teal", "blue", "purple", "pink")
+# upper hue bound of each chromatic family; red also takes 345..359
+_HUE_FAMILIES = ((15, "red"), (45, "orange"), (70, "yellow"), (165, "green"), (195, "teal"), (255, "blue"), (290, "purple"), (345, "pink"))
+
+def color_family(h: int | None, s: int | None, l: int | None) -> str | None:
+    # Same rule as the color_family column, for reads that must stay on a
+    # covering index (selecting the virtual column forces a table lookup).
+    if h is None:
+        return None
+    if (s is not None and s < 15) or (l is not None and (l < 12 or l > 92)):
+        return "neutral"
+    for bound, family in _HUE_FAMILIES:
+        if h < bound:
+            return family
+    return "red"
+
+_HEX_RE = re.compile(r"[0-9A-Fa-f]{6}")
 
 def hex_to_rgb(hex_color: str) -> tuple[int, int, int] | None:
     if not hex_color:
@@ -30,3 +55,44 @@ def hex_to_hsl(hex_color: str) -> tuple[int, int, int] | None:
     if not rgb:
         return None
     return rgb_to_hsl(*rgb)
+
+def rgb_to_hsl_array(rgb):
+    """(N, 3) uint8 RGB -> (N, 3) int HSL, matching rgb_to_hsl exactly.
+
+    Mirrors colorsys.rgb_to_hls operation for operation in float64 so the
+    rounded results agree with the scalar path bit for bit.
+    """
+    c = rgb.astype(np.float64) / 255.0
+    r, g, b = c[:, 0], c[:, 1], c[:, 2]
+    maxc = c.max(axis=1)
+    minc = c.min(axis=1)
+    sumc = maxc + minc
+    rangec = maxc - minc
+    l = sumc / 2.0
+    grey = rangec == 0
+    safe_range = np.where(grey, 1.0, rangec)
+    s = rangec / np.where(grey, 1.0, np.where(l <= 0.5, sumc, 2.0 - maxc - minc))
+    rc = (maxc - r) / safe_range
+    gc = (maxc - g) / safe_range
+    bc = (maxc - b) / safe_range
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.mod(h / 6.0, 1.0)
+    h = np.where(grey, 0.0, h)
+    s = np.where(grey, 0.0, s)
+    return np.stack([np.round(h * 360), np.round(s * 100), np.round(l * 100)], axis=1).astype(np.int64)
+
+def hex_to_hsl_batch(hex_colors: list[str | None]) -> list[tuple[int, int, int] | None]:
+    # Same results as [hex_to_hsl(h) for h in hex_colors], vectorized when numpy is available.
+    if np is None:
+        return [hex_to_hsl(h) if h else None for h in hex_colors]
+
+    cleaned = [h.strip().removeprefix("#") if h else "" for h in hex_colors]
+    valid = [i for i, h in enumerate(cleaned) if _HEX_RE.fullmatch(h)]
+    out: list[tuple[int, int, int] | None] = [None] * len(cleaned)
+    if not valid:
+        return out
+    raw = bytes.fromhex("".join(cleaned[i] for i in valid))
+    hsl = rgb_to_hsl_array(np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3))
+    for i, (h, s, l) in zip(valid, hsl.tolist()):
+        out[i] = (h, s, l)
+    return out
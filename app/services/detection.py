@@ -0,0 +1,52 @@
+import random
+import sqlite3
+
+from app.services.color_extract import dominant_color
+from app.services.uploads import UPLOAD_DIR
+
+DETECT_SLOTS = ["top", "bottom", "shoes", "outerwear"]
+
+def detect_photo_items(image_path: str) -> list[dict]:
+    # Fake “AI”. Creates 2-4 detected items. CPU-bound detectors plug in here;
+    # this runs in the job queue's process pool, so it must not touch the database.
+    possible = DETECT_SLOTS[:]
+    random.shuffle(possible)
+    k = random.randint(2, 4)
+    chosen = possible[:k]
+
+    sample_hex = ["#111111", "#FFFFFF", "#2D2A32", "#1E3A8A", "#0F766E", "#B91C1C", "#A16207"]
+
+    # image_path is the public /static/uploads/... URL
+    path = UPLOAD_DIR / image_path.rsplit("/", 1)[-1]
+    detections = []
+    for cat in chosen:
+        bbox_json = None
+        # the bbox crop, or color_extract.DEFAULT_REGION (a centre crop) without one
+        color = dominant_color(path, bbox_json)
+        detections.append({
+            "category": cat,
+            "slot": cat,
+            "bbox_json": bbox_json,
+            # no Pillow/numpy (or unreadable image): keep the old random sample
+            "extracted_color_hex": color["hex"] if color else random.choice(sample_hex),
+        })
+    return detections
+
+def store_detections(conn: sqlite3.Connection, photo_id: int, detections: list[dict]) -> None:
+    # clear any previous detections for this photo
+    conn.execute("DELETE FROM photo_items WHERE photo_id = ?", (photo_id,))
+    conn.executemany(
+        """
+        INSERT INTO photo_items (photo_id, category, slot, bbox_json, extracted_color_hex)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        [(photo_id, d["category"], d["slot"], d["bbox_json"], d["extracted_color_hex"]) for d in detections],
+    )
+
+# job queue handlers: compute runs in a worker process, store in the worker thread
+
+def detect_photo_job(payload: dict) -> list[dict]:
+    return detect_photo_items(payload["image_path"])
+
+def store_photo_job(conn: sqlite3.Connection, payload: dict, detections: list[dict]) -> None:
+    store_detections(conn, payload["photo_id"], detections)
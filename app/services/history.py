@@ -0,0 +1,46 @@
+import sqlite3
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+HISTORY_OUTFITS_SQL = "SELECT id, context, created_at, locked_slots FROM outfits ORDER BY id DESC LIMIT ?"
+HISTORY_OUTFITS_BEFORE_SQL = (
+    "SELECT id, context, created_at, locked_slots FROM outfits WHERE id < ? ORDER BY id DESC LIMIT ?"
+)
+
+def history_items_sql(outfit_ids) -> tuple[str, tuple]:
+    # outfit_items' primary key (outfit_id, item_id) serves the IN lookup
+    placeholders = ", ".join("?" for _ in outfit_ids)
+    sql = f"""
+        SELECT oi.outfit_id, oi.slot, i.*
+        FROM outfit_items oi
+        JOIN items i ON i.id = oi.item_id
+        WHERE oi.outfit_id IN ({placeholders})
+    """
+    return sql, tuple(outfit_ids)
+
+def load_history(
+    conn: sqlite3.Connection, before: int | None = None, limit: int = HISTORY_PAGE_SIZE
+) -> tuple[list[dict], int | None]:
+    # Keyset page of saved outfits (newest first) plus their items, in two queries.
+    # Returns the outfits and the `before` cursor for the next page, if any.
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    if before is None:
+        outfit_rows = conn.execute(HISTORY_OUTFITS_SQL, (limit + 1,)).fetchall()
+    else:
+        outfit_rows = conn.execute(HISTORY_OUTFITS_BEFORE_SQL, (before, limit + 1)).fetchall()
+
+    has_more = len(outfit_rows) > limit
+    outfit_rows = outfit_rows[:limit]
+    outfits = [{"meta": dict(o), "items": []} for o in outfit_rows]
+    if not outfits:
+        return outfits, None
+
+    by_id = {o["meta"]["id"]: o for o in outfits}
+    item_rows = conn.execute(*history_items_sql(by_id)).fetchall()
+    for r in item_rows:
+        item = dict(r)
+        by_id[item.pop("outfit_id")]["items"].append(item)
+
+    next_before = outfits[-1]["meta"]["id"] if has_more else None
+    return outfits, next_before
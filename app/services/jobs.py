@@ -0,0 +1,228 @@
+import json
+import logging
+import multiprocessing
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
+from uuid import uuid4
+
+from app.config import JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_POLL_SECONDS, JOB_PROCESSES, JOB_WORKERS
+from app.db.database import get_conn
+from app.services import detection
+
+log = logging.getLogger(__name__)
+
+# longest wait between attempts while the database keeps failing
+CLAIM_MAX_BACKOFF_SECONDS = 30.0
+
+def _bulk_ingest_job(conn: sqlite3.Connection, payload: dict, result: None) -> dict:
+    # imported here: bulk_ingest fans its detection out through this module's worker
+    from app.services.bulk_ingest import bulk_ingest
+
+    # left uncommitted, so the items commit together with complete()
+    return bulk_ingest(conn, payload["photo_ids"], commit=False)
+
+# kind -> (compute(payload) -> result, store(conn, payload, result) -> summary).
+# compute may run in another process: top-level, picklable, no database access.
+# A None compute runs store alone on the worker thread (it may call worker.map).
+# A summary store returns is kept as JSON in jobs.result. store must not
+# commit: complete() commits its writes together with the done marker.
+HANDLERS: dict[str, tuple[Callable | None, Callable]] = {
+    "detect_photo": (detection.detect_photo_job, detection.store_photo_job),
+    "bulk_ingest": (None, _bulk_ingest_job),
+}
+
+def enqueue(
+    conn: sqlite3.Connection, kind: str, payload: dict, ref_id: int | None = None, max_attempts: int = JOB_MAX_ATTEMPTS
+) -> int:
+    # Caller commits, so the job becomes visible together with the change that needs it.
+    cur = conn.execute(
+        "INSERT INTO jobs (kind, ref_id, payload, max_attempts) VALUES (?, ?, ?, ?)",
+        (kind, ref_id, json.dumps(payload), max_attempts),
+    )
+    return int(cur.lastrowid)
+
+def claim(conn: sqlite3.Connection) -> sqlite3.Row | None:
+    # Single statement, so two workers can never claim the same job. Running
+    # jobs whose lease expired (worker died) are picked up again, under a new
+    # claimed_by token that complete()/fail() must present.
+    row = conn.execute(
+        """
+        UPDATE jobs
+        SET status = 'running', attempts = attempts + 1, claimed_by = ?,
+            locked_until = datetime('now', ?), updated_at = datetime('now')
+        WHERE id = (
+            SELECT id FROM jobs
+            WHERE (status = 'pending' AND run_after <= datetime('now'))
+               OR (status = 'running' AND locked_until < datetime('now'))
+            ORDER BY id
+            LIMIT 1
+        )
+        RETURNING *
+        """,
+        (uuid4().hex, f"+{JOB_LEASE_SECONDS} seconds"),
+    ).fetchone()
+    conn.commit()
+    return row
+
+def complete(conn: sqlite3.Connection, job: sqlite3.Row, result: dict | None = None) -> bool:
+    # False (and nothing committed) when the lease was lost to another worker
+    cur = conn.execute(
+        """
+        UPDATE jobs SET status = 'done', result = ?, locked_until = NULL, last_error = NULL, updated_at = datetime('now')
+        WHERE id = ? AND claimed_by = ?
+        """,
+        (None if result is None else json.dumps(result), job["id"], job["claimed_by"]),
+    )
+    if cur.rowcount == 0:
+        conn.rollback()
+        return False
+    conn.commit()
+    return True
+
+def fail(conn: sqlite3.Connection, job: sqlite3.Row, error: str) -> None:
+    # retry with exponential backoff until max_attempts, then give up;
+    # a no-op when the lease was lost to another worker
+    if job["attempts"] < job["max_attempts"]:
+        conn.execute(
+            """
+            UPDATE jobs
+            SET status = 'pending', last_error = ?, locked_until = NULL,
+                run_after = datetime('now', ?), updated_at = datetime('now')
+            WHERE id = ? AND claimed_by = ?
+            """,
+            (error, f"+{2 ** job['attempts']} seconds", job["id"], job["claimed_by"]),
+        )
+    else:
+        conn.execute(
+            """
+            UPDATE jobs SET status = 'failed', last_error = ?, locked_until = NULL, updated_at = datetime('now')
+            WHERE id = ? AND claimed_by = ?
+            """,
+            (error, job["id"], job["claimed_by"]),
+        )
+    conn.commit()
+
+def latest_job(conn: sqlite3.Connection, kind: str, ref_id: int) -> dict | None:
+    row = conn.execute(
+        "SELECT id, status, attempts, max_attempts, last_error, updated_at FROM jobs WHERE kind = ? AND ref_id = ? ORDER BY id DESC LIMIT 1",
+        (kind, ref_id),
+    ).fetchone()
+    return dict(row) if row else None
+
+def get_job(conn: sqlite3.Connection, job_id: int) -> dict | None:
+    row = conn.execute(
+        "SELECT id, kind, status, attempts, max_attempts, last_error, result, updated_at FROM jobs WHERE id = ?",
+        (job_id,),
+    ).fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+class JobWorker:
+    """Worker threads that claim jobs; compute steps go to a process pool."""
+
+    def __init__(self, threads: int = JOB_WORKERS, processes: int = JOB_PROCESSES):
+        self.threads = threads
+        self.processes = processes
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._executor: ProcessPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+
+    def start(self) -> None:
+        if self._threads or self._executor is not None:
+            return
+        self._stop.clear()
+        self._executor = self._new_executor()
+        for i in range(self.threads):
+            t = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _new_executor(self) -> ProcessPoolExecutor | None:
+        if self.processes <= 0:
+            return None
+        # spawn: forking a threaded server process is not safe
+        return ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout=10)
+        self._threads = []
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def map(self, fn: Callable, payloads: list, chunksize: int = 1) -> list:
+        # Run a compute function over many payloads on the process pool (or inline).
+        executor = self._executor
+        if executor is None:
+            return [fn(p) for p in payloads]
+        return list(executor.map(fn, payloads, chunksize=chunksize))
+
+    def notify(self) -> None:
+        # new work was committed; skip the poll interval
+        self._wake.set()
+
+    def _run(self) -> None:
+        conn = get_conn()
+        backoff = JOB_POLL_SECONDS
+        try:
+            while not self._stop.is_set():
+                try:
+                    job = claim(conn)
+                    if job is not None:
+                        self._execute(conn, job)
+                except sqlite3.Error:
+                    # e.g. "database is locked": keep the worker alive and retry;
+                    # a job claimed meanwhile is picked up again once its lease expires
+                    log.exception("job worker database error; retrying in %.1fs", backoff)
+                    conn.rollback()
+                    self._stop.wait(backoff)
+                    backoff = min(backoff * 2, CLAIM_MAX_BACKOFF_SECONDS)
+                    continue
+                backoff = JOB_POLL_SECONDS
+                if job is None:
+                    self._wake.wait(JOB_POLL_SECONDS)
+                    self._wake.clear()
+        finally:
+            conn.close()
+
+    def _execute(self, conn: sqlite3.Connection, job: sqlite3.Row) -> None:
+        handler = HANDLERS.get(job["kind"])
+        if handler is None:
+            fail(conn, job, f"no handler for job kind {job['kind']!r}")
+            return
+        compute, store = handler
+        payload = json.loads(job["payload"])
+        executor = self._executor
+        try:
+            if compute is None:
+                result = None
+            elif executor is not None:
+                result = executor.submit(compute, payload).result()
+            else:
+                result = compute(payload)
+            summary = store(conn, payload, result)
+            # results and the done marker commit together
+            if not complete(conn, job, summary):
+                log.warning("job %s: lease lost to another worker, result discarded", job["id"])
+        except Exception as e:
+            conn.rollback()
+            fail(conn, job, repr(e))
+            if isinstance(e, BrokenProcessPool):
+                # a crashed child poisons the whole pool; start a fresh one
+                with self._executor_lock:
+                    if self._executor is executor:
+                        executor.shutdown(wait=False)
+                        self._executor = self._new_executor()
+
+worker = JobWorker()
@@ -0,0 +1,83 @@
+import sqlite3
+
+ITEMS_PAGE_SIZE = 60
+ITEMS_MAX_PAGE_SIZE = 200
+
+def load_items_page(
+    conn: sqlite3.Connection,
+    before: int | None = None,
+    limit: int = ITEMS_PAGE_SIZE,
+    category: str | None = None,
+    formality_min: int | None = None,
+    formality_max: int | None = None,
+    warmth: int | None = None,
+    color_family: str | None = None,
+    tag: str | None = None,
+) -> tuple[list[dict], int | None]:
+    # Keyset page of items (newest first) matching the filters, in one query.
+    # Each page walks an index from the cursor, so cost does not grow with the
+    # wardrobe (see query_plans.HOT_QUERIES). Returns the items and the next cursor.
+    limit = max(1, min(limit, ITEMS_MAX_PAGE_SIZE))
+    tag_id = None
+    if tag:
+        tag_row = conn.execute("SELECT id FROM tags WHERE name = ?", (tag,)).fetchone()
+        if not tag_row:
+            return [], None
+        tag_id = tag_row["id"]
+
+    sql, params = items_page_sql(
+        before, limit + 1, category, formality_min, formality_max, warmth, color_family, tag_id
+    )
+    rows = conn.execute(sql, params).fetchall()
+    has_more = len(rows) > limit
+    items = [dict(r) for r in rows[:limit]]
+    next_before = items[-1]["id"] if has_more else None
+    return items, next_before
+
+def items_page_sql(
+    before: int | None,
+    rows: int,
+    category: str | None = None,
+    formality_min: int | None = None,
+    formality_max: int | None = None,
+    warmth: int | None = None,
+    color_family: str | None = None,
+    tag_id: int | None = None,
+) -> tuple[str, list]:
+    where: list[str] = []
+    params: list = []
+
+    if tag_id is not None:
+        # drive from the tag's item list (idx_item_tags_tag_id is ordered by item_id)
+        sql = "SELECT i.* FROM item_tags t JOIN items i ON i.id = t.item_id"
+        where.append("t.tag_id = ?")
+        params.append(tag_id)
+        id_col = "t.item_id"
+    else:
+        sql = "SELECT i.* FROM items i"
+        id_col = "i.id"
+
+    if before is not None:
+        where.append(f"{id_col} < ?")
+        params.append(before)
+    if category:
+        where.append("i.category = ?")
+        params.append(category)
+    if formality_min is not None:
+        where.append("i.formality >= ?")
+        params.append(formality_min)
+    if formality_max is not None:
+        where.append("i.formality <= ?")
+        params.append(formality_max)
+    if warmth is not None:
+        where.append("i.warmth = ?")
+        params.append(warmth)
+    if color_family:
+        where.append("i.color_family = ?")
+        params.append(color_family)
+
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {id_col} DESC LIMIT ?"
+    params.append(rows)
+    return sql, params
@@ -1,7 +1,21 @@
+import heapq
 import random
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
+from itertools import islice
+from typing import Iterator
+
+try:
+    import numpy as np
+except ImportError:  # optional: vectorized scoring falls back to the scalar loop
+    np = None
+
+from app.metrics import timed
 
 SLOTS = ["top", "bottom", "shoes", "outerwear"]
+# the solver (outfit_solver.py) also fills an accessory; the engine sticks to
+# SLOTS, but keeps a locked accessory as is
+ALL_SLOTS = SLOTS + ["accessory"]
 
 CONTEXT_RULES = {
     "office": {"formality_min": 3},
@@ -10,83 +24,421 @@ CONTEXT_RULES = {
     "gym": {"formality_min": 1},
 }
 
+# Good: same hue (0), analogous (~30), complementary (~180)
+HARMONY_TARGETS = (0, 30, 180)
+# the same targets as offsets around a seed hue on the colour wheel
+TARGET_OFFSETS = (0, 30, -30, 180)
+MISSING_HUE_SCORE = -9999.0
+
+# how far down a slot's ranking to look for a piece that was not worn recently
+FRESH_LOOKAHEAD = 8
+
+# "scan": per-item Python loop, "numpy": batched array scoring,
+# "index": binary search in the category's hue-sorted index
+METHODS = ("scan", "numpy", "index")
+
 def hue_dist(a: int, b: int) -> int:
     d = abs(a - b) % 360
     return min(d, 360 - d)
 
+# harmony only depends on the hue difference, so score all 360 deltas once
+HARMONY_BY_DELTA = [
+    -float(min(abs(min(d, 360 - d) - t) for t in HARMONY_TARGETS)) for d in range(360)
+]
+HARMONY_BY_DELTA_NP = np.array(HARMONY_BY_DELTA) if np is not None else None
+
 def harmony_score(h1: int, h2: int) -> float:
-    d = hue_dist(h1, h2)
-    # Good: same hue (0), analogous (~30), complementary (~180)
-    targets = [0, 30, 180]
-    best = min(abs(d - t) for t in targets)
-    return -float(best)  # higher is better
+    return HARMONY_BY_DELTA[(h1 - h2) % 360]  # higher is better
 
-def generate_outfit(items: list[dict], context: str) -> dict:
-    rules = CONTEXT_RULES.get(context, {})
-    min_formality = rules.get("formality_min", 1)
+def harmony_scores(seed_h: int, hues, has_hue):
+    # Batched harmony_score for a whole category; missing hues score MISSING_HUE_SCORE.
+    scores = HARMONY_BY_DELTA_NP[(hues - int(seed_h)) % 360]
+    return np.where(has_hue, scores, MISSING_HUE_SCORE)
 
-    filtered = [it for it in items if int(it.get("formality", 1)) >= min_formality]
+def _circular_gap(sorted_hues: list[int], target: int) -> int:
+    # distance from target to the nearest hue in a sorted 0..359 list
+    i = bisect_left(sorted_hues, target)
+    after = sorted_hues[i % len(sorted_hues)]
+    before = sorted_hues[i - 1]
+    return min(hue_dist(target, after), hue_dist(target, before))
 
-    by_category = defaultdict(list)
-    for it in filtered:
-        by_category[it.get("category")].append(it)
+class RankedSlot:
+    """A slot's options ordered by harmony with one anchor hue, best first.
 
-    outfit: dict[str, dict] = {}
+    Stored as hue buckets plus running totals, so indexing any rank is a
+    bisect over at most 361 buckets. Ranks wrap around.
+    """
 
-    # pick a seed slot
-    seed_slot = None
-    for s in ["top", "outerwear", "bottom", "shoes"]:
-        if by_category.get(s):
-            seed_slot = s
-            break
+    def __init__(self, buckets: list[list[dict]]):
+        self.buckets = buckets
+        self.ends: list[int] = []
+        total = 0
+        for bucket in buckets:
+            total += len(bucket)
+            self.ends.append(total)
 
-    if not seed_slot:
-        return outfit
+    def __len__(self) -> int:
+        return self.ends[-1] if self.ends else 0
 
-    seed = random.choice(by_category[seed_slot])
-    outfit[seed_slot] = seed
-    seed_h = seed.get("color_h")
+    def __getitem__(self, rank: int) -> dict:
+        if not self.ends:
+            raise IndexError("no options for this slot")
+        rank %= self.ends[-1]
+        b = bisect_right(self.ends, rank)
+        start = self.ends[b - 1] if b else 0
+        return self.buckets[b][rank - start]
 
-    for slot in SLOTS:
-        if slot == seed_slot:
-            continue
-        options = by_category.get(slot, [])
+class CandidatePool:
+    """Context-filtered items grouped by category, plus per-category hue arrays."""
+
+    def __init__(self, items: list[dict], context: str):
+        rules = CONTEXT_RULES.get(context, {})
+        min_formality = rules.get("formality_min", 1)
+
+        self.by_category: dict[str, list[dict]] = defaultdict(list)
+        for it in items:
+            if int(it.get("formality", 1)) >= min_formality:
+                self.by_category[it.get("category")].append(it)
+        self._hues: dict[str, tuple] = {}
+        self._hue_index: dict[str, tuple[list[int], dict[int, int]]] = {}
+        self._buckets: dict[str, dict[int | None, list[dict]]] = {}
+        self._ranked: dict[tuple[str, int | None], RankedSlot] = {}
+        self._families: dict[str, dict[str | None, list[dict]]] = {}
+
+    def hues(self, slot: str) -> tuple:
+        arrays = self._hues.get(slot)
+        if arrays is None:
+            raw = [it.get("color_h") for it in self.by_category.get(slot, [])]
+            hues = np.array([int(h) if h is not None else 0 for h in raw], dtype=np.int64)
+            has_hue = np.array([h is not None for h in raw], dtype=bool)
+            arrays = self._hues[slot] = (hues, has_hue)
+        return arrays
+
+    def hue_index(self, slot: str) -> tuple[list[int], dict[int, int]]:
+        # (distinct hues sorted, hue -> position of its first option)
+        index = self._hue_index.get(slot)
+        if index is None:
+            first_pos: dict[int, int] = {}
+            for pos, it in enumerate(self.by_category.get(slot, [])):
+                h = it.get("color_h")
+                if h is not None:
+                    first_pos.setdefault(int(h) % 360, pos)
+            index = self._hue_index[slot] = (sorted(first_pos), first_pos)
+        return index
+
+    def hue_buckets(self, slot: str) -> dict[int | None, list[dict]]:
+        # hue -> options with that hue, in pool order; keys in order of first appearance
+        buckets = self._buckets.get(slot)
+        if buckets is None:
+            buckets = {}
+            for it in self.by_category.get(slot, []):
+                h = it.get("color_h")
+                buckets.setdefault(None if h is None else int(h) % 360, []).append(it)
+            self._buckets[slot] = buckets
+        return buckets
+
+    def families(self, slot: str) -> dict[str | None, list[dict]]:
+        # color_family -> options, in pool order
+        families = self._families.get(slot)
+        if families is None:
+            families = {}
+            for it in self.by_category.get(slot, []):
+                families.setdefault(it.get("color_family"), []).append(it)
+            self._families[slot] = families
+        return families
+
+    def ranked(self, slot: str, anchor_h: int | None) -> RankedSlot:
+        # Cached per (slot, anchor hue); rank 0 is what best_match() returns.
+        key = (slot, None if anchor_h is None else int(anchor_h) % 360)
+        ranked = self._ranked.get(key)
+        if ranked is None:
+            buckets = self.hue_buckets(slot)
+            order = list(buckets)
+            if key[1] is not None:
+                # stable sort: equal scores keep first-appearance order
+                order.sort(key=lambda h: -_hue_score(key[1], h))
+            ranked = self._ranked[key] = RankedSlot([buckets[h] for h in order])
+        return ranked
+
+    def best_match(self, slot: str, seed_h: int, method: str = "index") -> dict | None:
+        options = self.by_category.get(slot, [])
         if not options:
-            continue
+            return None
 
-        # fallback random if no hue data
-        if seed_h is None:
-            outfit[slot] = random.choice(options)
-            continue
+        if method == "numpy" and np is None:
+            method = "index"
+
+        if method == "index":
+            sorted_hues, first_pos = self.hue_index(slot)
+            if not sorted_hues:
+                return options[0]
+            # the best hues sit exactly `gap` away from one of the target positions;
+            # ties go to the earliest option, as in the scan
+            targets = [(int(seed_h) + off) % 360 for off in TARGET_OFFSETS]
+            gap = min(_circular_gap(sorted_hues, t) for t in targets)
+            winners = {(t + sign * gap) % 360 for t in targets for sign in (1, -1)}
+            return options[min(first_pos[h] for h in winners if h in first_pos)]
+
+        if method == "numpy":
+            hues, has_hue = self.hues(slot)
+            return options[int(np.argmax(harmony_scores(seed_h, hues, has_hue)))]
 
         best_it = None
         best_score = -10_000.0
         for it in options:
             h = it.get("color_h")
             if h is None:
-                score = -9999.0
+                score = MISSING_HUE_SCORE
             else:
                 score = harmony_score(int(seed_h), int(h))
             if score > best_score:
                 best_score = score
                 best_it = it
+        return best_it
+
+SEED_ORDER = ["top", "outerwear", "bottom", "shoes"]
+
+def _seed_slot(pool: CandidatePool, locked: dict[str, dict]) -> str | None:
+    for s in SEED_ORDER:
+        if s not in locked and pool.by_category.get(s):
+            return s
+    return None
+
+def _anchor_hue(locked: dict[str, dict]) -> int | None:
+    # the first locked item with hue data sets the colour scheme
+    for s in SEED_ORDER:
+        it = locked.get(s)
+        if it and it.get("color_h") is not None:
+            return int(it["color_h"])
+    return None
+
+def _hue_score(anchor_h: int, h: int | None) -> float:
+    return MISSING_HUE_SCORE if h is None else harmony_score(int(anchor_h), int(h))
+
+def _fresh_rank(ranked: RankedSlot, last_worn: dict[int, int] | None) -> int:
+    # the first of the top few candidates not worn recently, else the best one
+    if last_worn:
+        for rank in range(min(FRESH_LOOKAHEAD, len(ranked))):
+            if ranked[rank]["id"] not in last_worn:
+                return rank
+    return 0
+
+def _fresh_first(order: Iterator[dict], last_worn: dict[int, int] | None) -> Iterator[dict]:
+    # keep the order, but hold back recently worn items until the rest are used
+    held = []
+    for it in order:
+        if last_worn and it["id"] in last_worn:
+            held.append(it)
+        else:
+            yield it
+    yield from held
+
+def _complete_outfit(
+    pool: CandidatePool,
+    seed_slot: str,
+    seed: dict,
+    rng: random.Random,
+    method: str,
+    locked: dict[str, dict],
+    last_worn: dict[int, int] | None = None,
+) -> dict:
+    outfit: dict[str, dict] = dict(locked)
+    outfit[seed_slot] = seed
+    anchor_h = _anchor_hue(locked)
+    if anchor_h is None:
+        anchor_h = seed.get("color_h")
+
+    for slot in SLOTS:
+        if slot in outfit:
+            continue
+        options = pool.by_category.get(slot, [])
+        if not options:
+            continue
 
-        outfit[slot] = best_it or random.choice(options)
+        # fallback random if no hue data
+        if anchor_h is None:
+            outfit[slot] = rng.choice(options)
+            continue
+
+        best = pool.best_match(slot, anchor_h, method) or rng.choice(options)
+        if last_worn and best["id"] in last_worn:
+            # the ranking is only built when the best match was worn recently
+            ranked = pool.ranked(slot, anchor_h)
+            best = ranked[_fresh_rank(ranked, last_worn)]
+        outfit[slot] = best
 
     return outfit
 
-def generate_outfits(items: list[dict], context: str, k: int = 3) -> list[dict]:
-    seen = set()
-    outfits = []
-    tries = 0
+def _outfit_score(
+    pool: CandidatePool, seed_slot: str, seed_h: int | None, method: str, locked: dict[str, dict]
+) -> float:
+    total = 0.0
+    anchor_h = _anchor_hue(locked)
+    if anchor_h is None:
+        anchor_h = seed_h
+    else:
+        total += _hue_score(anchor_h, seed_h)
+    if anchor_h is None:
+        return MISSING_HUE_SCORE
+
+    for slot in SLOTS:
+        if slot == seed_slot or slot in locked:
+            continue
+        best = pool.best_match(slot, anchor_h, method)
+        if best is not None:
+            total += _hue_score(anchor_h, best.get("color_h"))
+    return total
+
+def _shuffled(seq: list, rng: random.Random) -> Iterator:
+    # Fisher-Yates one step at a time, so taking the first few costs O(1) each
+    moved: dict[int, object] = {}
+    n = len(seq)
+    for i in range(n):
+        j = rng.randrange(i, n)
+        yield moved.get(j, seq[j])
+        moved[j] = moved.get(i, seq[i])
+
+def _best_first(
+    pool: CandidatePool, seed_slot: str, rng: random.Random, method: str, locked: dict[str, dict]
+) -> Iterator[dict]:
+    seeds = pool.by_category[seed_slot]
+    # an outfit's score only depends on the seed hue, so score each hue once
+    by_hue: dict[int | None, float] = {}
+    heap = []
+    for pos, it in enumerate(seeds):
+        h = it.get("color_h")
+        if h not in by_hue:
+            by_hue[h] = _outfit_score(pool, seed_slot, h, method, locked)
+        heap.append((-by_hue[h], rng.random(), pos))
+    heapq.heapify(heap)
+    while heap:
+        yield seeds[heapq.heappop(heap)[2]]
 
-    while len(outfits) < k and tries < 50:
-        tries += 1
-        o = generate_outfit(items, context)
+def iter_outfits(
+    items: list[dict] | CandidatePool,
+    context: str,
+    seed: int | None = None,
+    ranked: bool = False,
+    method: str = "index",
+    locked: dict[str, dict] | None = None,
+    last_worn: dict[int, int] | None = None,
+) -> Iterator[dict]:
+    """Yield distinct outfits lazily, one per seed-slot item.
+
+    Seed items are visited in a random order (reproducible with ``seed``), or
+    best total harmony first when ``ranked`` is set, with random tie-breaks.
+    Ends once every seed-slot item has been tried.
+
+    ``locked`` maps slots to items that every outfit must keep; the seed is
+    then drawn from the first unlocked slot and the other slots match the
+    first locked item's hue.
+
+    ``last_worn`` (item id -> outfits since it was worn, see
+    usage.recent_wear) moves recently worn seeds to the end and, for the
+    other slots, prefers a near-best match that was not worn recently.
+    """
+    pool = _as_pool(items, context)
+    rng = random.Random(seed)
+    locked = {slot: it for slot, it in (locked or {}).items() if it}
+    seed_slot = _seed_slot(pool, locked)
+    if not seed_slot:
+        if locked:
+            yield dict(locked)
+        return
+
+    seeds = pool.by_category[seed_slot]
+    if ranked:
+        order = _best_first(pool, seed_slot, rng, method, locked)
+    else:
+        order = _shuffled(seeds, rng)
+    seen = set()
+    for seed_item in _fresh_first(order, last_worn):
+        o = _complete_outfit(pool, seed_slot, seed_item, rng, method, locked, last_worn)
         key = tuple((slot, o.get(slot, {}).get("id")) for slot in SLOTS)
         if key in seen:
             continue
         seen.add(key)
-        outfits.append(o)
+        yield o
+
+def _slot_anchor(outfit: dict[str, dict], slot: str, locked_slots) -> int | None:
+    # locked items set the colour scheme; otherwise the rest of the outfit does
+    others = {s: it for s, it in outfit.items() if s != slot and it}
+    anchor_h = _anchor_hue({s: it for s, it in others.items() if s in locked_slots})
+    return _anchor_hue(others) if anchor_h is None else anchor_h
+
+def fill_outfit(
+    pool: CandidatePool,
+    outfit: dict[str, dict],
+    locked_slots=(),
+    rng: random.Random | None = None,
+    last_worn: dict[int, int] | None = None,
+    ranks: dict[str, int] | None = None,
+) -> dict[str, dict]:
+    """Fill the empty slots of ``outfit`` with their best-ranked candidates.
+
+    An empty outfit starts from a random seed-slot item, like generate_outfit.
+    With ``last_worn`` (see iter_outfits), a near-best candidate that was not
+    worn recently wins; ``ranks`` receives the rank picked for each filled slot.
+    """
+    outfit = {s: it for s, it in outfit.items() if it}
+    if not outfit:
+        seed_slot = _seed_slot(pool, {})
+        if seed_slot is None:
+            return {}
+        seeds = pool.by_category[seed_slot]
+        fresh = [it for it in seeds if it["id"] not in last_worn] if last_worn else seeds
+        outfit[seed_slot] = (rng or random).choice(fresh or seeds)
+    for slot in SLOTS:
+        if slot not in outfit and pool.by_category.get(slot):
+            ranked = pool.ranked(slot, _slot_anchor(outfit, slot, locked_slots))
+            rank = _fresh_rank(ranked, last_worn)
+            outfit[slot] = ranked[rank]
+            if ranks is not None:
+                ranks[slot] = rank
+    return outfit
+
+def step_slot(
+    pool: CandidatePool, outfit: dict[str, dict], slot: str, rank: int, locked_slots=()
+) -> tuple[dict | None, int]:
+    """Candidate number ``rank`` for ``slot`` against the rest of ``outfit``.
+
+    Returns (item, rank used); steps past the slot's current item so a reroll
+    always changes something when it can.
+    """
+    ranked = pool.ranked(slot, _slot_anchor(outfit, slot, locked_slots))
+    n = len(ranked)
+    if not n:
+        return None, 0
+    rank %= n
+    current = outfit.get(slot)
+    if current and n > 1 and ranked[rank]["id"] == current["id"]:
+        rank = (rank + 1) % n
+    return ranked[rank], rank
+
+def _as_pool(items: list[dict] | CandidatePool, context: str) -> CandidatePool:
+    # callers holding a cached pool skip the grouping and index builds
+    return items if isinstance(items, CandidatePool) else CandidatePool(items, context)
+
+@timed("generate_outfit")
+def generate_outfit(
+    items: list[dict] | CandidatePool,
+    context: str,
+    method: str = "index",
+    seed: int | None = None,
+    last_worn: dict[int, int] | None = None,
+) -> dict:
+    return next(iter_outfits(items, context, seed=seed, method=method, last_worn=last_worn), {})
 
-    return outfits
+@timed("generate_outfits")
+def generate_outfits(
+    items: list[dict] | CandidatePool,
+    context: str,
+    k: int = 3,
+    method: str = "index",
+    seed: int | None = None,
+    ranked: bool = False,
+    locked: dict[str, dict] | None = None,
+    last_worn: dict[int, int] | None = None,
+) -> list[dict]:
+    outfits = iter_outfits(items, context, seed=seed, ranked=ranked, method=method, locked=locked, last_worn=last_worn)
+    return list(islice(outfits, k))
@@ -0,0 +1,173 @@
+import heapq
+from itertools import combinations
+from typing import Callable
+
+from app.metrics import timed
+from app.services.outfit_engine import ALL_SLOTS, CandidatePool, HARMONY_BY_DELTA
+
+# Slots an outfit may leave empty; the others are filled whenever the pool has options.
+OPTIONAL_SLOTS = ("outerwear", "accessory")
+
+BEAM_WIDTH = 16
+# per slot, keep this many best-scoring items from each colour family
+CANDIDATES_PER_FAMILY = 3
+# plus up to this many items that have proven pairings (see usage.load_pairings)
+PAIRED_PER_SLOT = 8
+# outfits back over which a worn item still takes a recency penalty
+RECENCY_WINDOW = 30
+
+WORST_HARMONY = min(HARMONY_BY_DELTA)
+
+# Scoring terms. Each scores roughly -1 (bad) .. 1 (good); 0 means no opinion.
+# Unary terms score a list of items at once (one value per item), pair terms
+# one pair of items in the outfit; params holds the request's targets.
+
+def pair_harmony(a: dict, b: dict, params: dict) -> float:
+    # color_family (see migrations) marks greys, blacks and whites as neutral
+    if a.get("color_family") == "neutral" or b.get("color_family") == "neutral":
+        return 0.5  # go with anything, but never beat a real match
+    ha, hb = a.get("color_h"), b.get("color_h")
+    if ha is None or hb is None:
+        return 0.0
+    return 1.0 - 2.0 * HARMONY_BY_DELTA[(int(ha) - int(hb)) % 360] / WORST_HARMONY
+
+def pair_formality(a: dict, b: dict, params: dict) -> float:
+    # the context's floor is applied by the pool; this keeps pieces consistent
+    return 1.0 - abs(int(a.get("formality", 1)) - int(b.get("formality", 1))) / 2.0
+
+def unary_warmth(items: list[dict], params: dict) -> list[float]:
+    target = params.get("warmth")
+    if target is None:
+        return [0.0] * len(items)
+    by_warmth = {w: 1.0 - abs(w - target) / 2.0 for w in range(1, 6)}
+    return [by_warmth.get(it.get("warmth"), 0.0) for it in items]
+
+def unary_recency(items: list[dict], params: dict) -> list[float]:
+    # last_worn: item id -> outfits since it was last worn (0 = the latest outfit)
+    last_worn = params.get("last_worn") or {}
+    if not last_worn:
+        return [0.0] * len(items)
+    return [
+        -max(0.0, 1.0 - last_worn[it["id"]] / RECENCY_WINDOW) if it["id"] in last_worn else 0.0
+        for it in items
+    ]
+
+def pair_pairing(a: dict, b: dict, params: dict) -> float:
+    # how reliably the two were worn together before (usage.load_pairings)
+    key = (a["id"], b["id"]) if a["id"] < b["id"] else (b["id"], a["id"])
+    return params.get("pairings", {}).get(key, 0.0)
+
+UNARY_TERMS: dict[str, Callable[[list[dict], dict], list[float]]] = {
+    "warmth": unary_warmth,
+    "recency": unary_recency,
+}
+PAIR_TERMS: dict[str, Callable[[dict, dict, dict], float]] = {
+    "harmony": pair_harmony,
+    "formality": pair_formality,
+    "pairing": pair_pairing,
+}
+DEFAULT_WEIGHTS = {"harmony": 1.0, "formality": 0.4, "warmth": 0.6, "recency": 0.8, "pairing": 0.5}
+
+def _unary_scores(items: list[dict], unary: list[tuple[Callable, float]], params: dict) -> list[float]:
+    totals = [0.0] * len(items)
+    for fn, w in unary:
+        totals = [t + w * v for t, v in zip(totals, fn(items, params))]
+    return totals
+
+def _shortlist(pool: CandidatePool, slot: str, unary: list[tuple[Callable, float]], params: dict) -> list[tuple[float, dict]]:
+    # Prune a slot to its best few items per colour family, so the beam still
+    # sees every family without scoring all pairs, plus the best few items with
+    # a proven pairing so that term gets a say. Ties keep pool order.
+    paired = params["paired_ids"]
+    shortlist, extra = [], []
+    for family in pool.families(slot).values():
+        scores = _unary_scores(family, unary, params)
+        best = heapq.nlargest(CANDIDATES_PER_FAMILY, range(len(family)), key=lambda i: (scores[i], -i))
+        shortlist += [(scores[i], family[i]) for i in best]
+        if paired:
+            extra += [(scores[i], it) for i, it in enumerate(family) if it["id"] in paired and i not in best]
+    return shortlist + heapq.nlargest(PAIRED_PER_SLOT, extra, key=lambda t: t[0])
+
+def score_outfit(outfit: dict[str, dict], params: dict, weights: dict[str, float] | None = None) -> dict[str, float]:
+    """Weighted term totals for a finished outfit, plus their sum under "total"."""
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    pieces = [it for it in outfit.values() if it]
+    terms = {}
+    for name, fn in UNARY_TERMS.items():
+        terms[name] = weights.get(name, 0.0) * sum(fn(pieces, params))
+    for name, fn in PAIR_TERMS.items():
+        terms[name] = weights.get(name, 0.0) * sum(fn(a, b, params) for a, b in combinations(pieces, 2))
+    terms["total"] = sum(terms.values())
+    return {name: round(v, 4) for name, v in terms.items()}
+
+@timed("solve_outfits")
+def solve_outfits(
+    pool: CandidatePool,
+    k: int = 3,
+    warmth: int | None = None,
+    last_worn: dict[int, int] | None = None,
+    pairings: dict[tuple[int, int], float] | None = None,
+    weights: dict[str, float] | None = None,
+    locked: dict[str, dict] | None = None,
+    beam_width: int = BEAM_WIDTH,
+) -> list[dict]:
+    """Top-k whole outfits under the weighted objective, by beam search.
+
+    Slots are filled in ALL_SLOTS order, keeping the ``beam_width`` (at least
+    ``k``) best partial outfits after each one; every slot is first pruned to a shortlist
+    (see CANDIDATES_PER_FAMILY). Optional slots stay empty when no item
+    improves the score. ``last_worn`` and ``pairings`` come from
+    app/services/usage.py. ``locked`` pins slots to given items, ``weights``
+    overrides DEFAULT_WEIGHTS by term name.
+
+    Returns [{"score": float, "outfit": {slot: item}}], best first.
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    pairings = pairings or {}
+    params = {
+        "warmth": warmth,
+        "last_worn": last_worn or {},
+        "pairings": pairings,
+        "paired_ids": {item_id for pair in pairings for item_id in pair},
+    }
+    unary = [(fn, weights[name]) for name, fn in UNARY_TERMS.items() if weights.get(name)]
+    pair = [(fn, weights[name]) for name, fn in PAIR_TERMS.items() if weights.get(name)]
+    locked = {slot: it for slot, it in (locked or {}).items() if it}
+    width = max(beam_width, k)
+
+    # beam entries share most of their pieces, so each pair is scored once
+    pair_cache: dict[tuple[int, int], float] = {}
+    # a beam entry: (score, -arrival, filled slots, items in fill order); the
+    # unique second field settles ties before tuples of dicts get compared
+    beam: list[tuple[float, int, tuple[str, ...], tuple[dict, ...]]] = [(0.0, 0, (), ())]
+    for slot in ALL_SLOTS:
+        if slot in locked:
+            shortlist = [(_unary_scores([locked[slot]], unary, params)[0], locked[slot])]
+        elif pool.by_category.get(slot):
+            shortlist = _shortlist(pool, slot, unary, params)
+        else:
+            continue
+
+        expanded = []
+        for score, _, slots, pieces in beam:
+            if slot in OPTIONAL_SLOTS and slot not in locked:
+                expanded.append((score, -len(expanded), slots, pieces))
+            for item_score, it in shortlist:
+                total = score + item_score
+                for other in pieces:
+                    key = (it["id"], other["id"])
+                    p = pair_cache.get(key)
+                    if p is None:
+                        p = 0.0
+                        for fn, w in pair:
+                            p += w * fn(it, other, params)
+                        pair_cache[key] = p
+                    total += p
+                expanded.append((total, -len(expanded), slots + (slot,), pieces + (it,)))
+        beam = heapq.nlargest(width, expanded)
+
+    return [
+        {"score": round(score, 4), "outfit": dict(zip(slots, pieces))}
+        for score, _, slots, pieces in beam[:k]
+        if pieces
+    ]
@@ -0,0 +1,74 @@
+import re
+import sqlite3
+
+from markupsafe import Markup, escape
+
+from app.config import SEARCH_RANK_WINDOW
+
+SEARCH_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# column weights for bm25(): name, category, color_primary, color_secondary, notes, tags
+BM25_WEIGHTS = (10.0, 4.0, 5.0, 3.0, 1.0, 6.0)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# snippet() markers; swapped for <mark> after the text is HTML-escaped
+_OPEN, _CLOSE = "\x02", "\x03"
+
+def match_query(text: str) -> str | None:
+    # User text -> FTS5 query: every word must match, the last one as a prefix
+    # (search-as-you-type). Words are quoted, so FTS syntax in the input is inert.
+    tokens = _TOKEN_RE.findall(text)
+    if not tokens:
+        return None
+    terms = [f'"{t}"' for t in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+def _snippet_html(raw: str) -> Markup:
+    return Markup(str(escape(raw)).replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>"))
+
+def search_items(
+    conn: sqlite3.Connection, text: str, limit: int = SEARCH_LIMIT, rank_window: int = SEARCH_RANK_WINDOW
+) -> list[dict]:
+    """Items matching `text`, best first (bm25), each with a highlighted `snippet` (HTML).
+
+    With rank_window > 0 only the newest rank_window matches are ranked, which
+    caps the cost of very common terms but can miss better, older matches.
+    """
+    query = match_query(text)
+    if query is None:
+        return []
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    min_id = 0
+    if rank_window > 0:
+        # walking the doclist newest-first is cheap; start ranking at the Nth newest match
+        cutoff = conn.execute(
+            "SELECT rowid FROM items_fts WHERE items_fts MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+            (query, rank_window),
+        ).fetchone()
+        min_id = cutoff[0] if cutoff else 0
+
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    # ORDER BY rank lets FTS5 sort internally, so snippet() and the items
+    # lookup only run for the rows actually returned
+    rows = conn.execute(
+        f"""
+        SELECT i.*, m.snippet
+        FROM (
+            SELECT rowid, rank, snippet(items_fts, -1, '{_OPEN}', '{_CLOSE}', '…', 10) AS snippet
+            FROM items_fts
+            WHERE items_fts MATCH ? AND rank MATCH 'bm25({weights})' AND rowid > ?
+            ORDER BY rank
+            LIMIT ?
+        ) m
+        JOIN items i ON i.id = m.rowid
+        ORDER BY m.rank
+        """,
+        (query, min_id, limit),
+    ).fetchall()
+    results = []
+    for r in rows:
+        item = dict(r)
+        item["snippet"] = _snippet_html(item["snippet"] or "")
+        results.append(item)
+    return results
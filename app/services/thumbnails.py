@@ -0,0 +1,72 @@
+import os
+from pathlib import Path
+from uuid import uuid4
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional: without Pillow the originals are served
+    Image = None
+
+from app.services.uploads import UPLOAD_DIR
+
+THUMB_WIDTHS = (160, 480, 960)
+THUMB_DIR = Path("app/cache/thumbs")
+THUMB_FORMAT = "webp"
+THUMB_QUALITY = 80
+UPLOAD_PREFIX = "/static/uploads/"
+
+def thumb_url(image_path: str | None, width: int) -> str | None:
+    # Template filter: derivative URL for an uploaded image, else the path unchanged.
+    if not image_path or not image_path.startswith(UPLOAD_PREFIX):
+        return image_path
+    return f"/thumbs/{width}/{image_path[len(UPLOAD_PREFIX):]}"
+
+def thumb_srcset(image_path: str | None) -> str:
+    if not image_path or not image_path.startswith(UPLOAD_PREFIX):
+        return ""
+    return ", ".join(f"{thumb_url(image_path, w)} {w}w" for w in THUMB_WIDTHS)
+
+def source_path(name: str) -> Path | None:
+    # only plain file names inside the upload directory
+    if not name or Path(name).name != name:
+        return None
+    path = UPLOAD_DIR / name
+    return path if path.is_file() else None
+
+def thumb_etag(name: str, width: int) -> str:
+    # upload names are content hashes (or never-reused uuids), so name+width is stable
+    return f'"{Path(name).stem}-{width}"'
+
+def ensure_thumbnail(source: Path, width: int) -> Path:
+    # Renders on first request; later requests reuse the cached file.
+    dest = THUMB_DIR / f"{source.stem}-{width}.{THUMB_FORMAT}"
+    if dest.exists():
+        return dest
+
+    THUMB_DIR.mkdir(parents=True, exist_ok=True)
+    with Image.open(source) as img:
+        # let the JPEG decoder downscale while decoding
+        img.draft("RGB", (width, width))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        if img.width > width:
+            img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+        tmp = dest.with_name(f"{uuid4().hex}.part")
+        try:
+            img.save(tmp, format=THUMB_FORMAT, quality=THUMB_QUALITY, method=4)
+            os.replace(tmp, dest)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+    return dest
+
+def purge_thumbnails(image_paths: list[str]) -> int:
+    # drop cached derivatives of uploads that were garbage collected
+    removed = 0
+    for image_path in image_paths:
+        stem = Path(image_path).stem
+        for path in THUMB_DIR.glob(f"{stem}-*.{THUMB_FORMAT}"):
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+from uuid import uuid4
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.config import UPLOAD_CHUNK_BYTES, UPLOAD_MAX_FILE_BYTES, UPLOAD_MAX_REQUEST_BYTES
+
+UPLOAD_DIR = Path("app/static/uploads")
+# multipart boundaries, headers and form fields on top of the file bytes
+MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+
+@dataclass
+class SavedUpload:
+    path: str  # public URL path, stored in image_path columns
+    sha256: str
+    size: int
+    new: bool = True  # False when identical content was already stored
+
+class _Budget:
+    # bytes still allowed for the whole request, shared by concurrent writers
+    def __init__(self, limit: int):
+        self.remaining = limit
+        self._lock = threading.Lock()
+
+    def take(self, n: int) -> bool:
+        with self._lock:
+            if n > self.remaining:
+                return False
+            self.remaining -= n
+            return True
+
+def _too_large(filename: str, limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"{filename}: upload exceeds {limit} bytes")
+
+def _write_stream(src: BinaryIO, filename: str, budget: _Budget) -> SavedUpload:
+    # Runs in a worker thread: copy the spooled upload in chunks, hashing as we go,
+    # then store it under its content hash so identical uploads share one file.
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    suffix = Path(filename).suffix.lower()
+    tmp = UPLOAD_DIR / f"{uuid4().hex}.part"
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with tmp.open("wb") as out:
+            while chunk := src.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > UPLOAD_MAX_FILE_BYTES:
+                    raise _too_large(filename, UPLOAD_MAX_FILE_BYTES)
+                if not budget.take(len(chunk)):
+                    raise _too_large("request", UPLOAD_MAX_REQUEST_BYTES)
+                digest.update(chunk)
+                out.write(chunk)
+        sha256 = digest.hexdigest()
+        safe_name = f"{sha256}{suffix}"
+        new = not (UPLOAD_DIR / safe_name).exists()
+        # replacing an existing copy is harmless (same bytes) and guarantees the
+        # file is present even if the collector just removed it
+        os.replace(tmp, UPLOAD_DIR / safe_name)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+    return SavedUpload(path=f"/static/uploads/{safe_name}", sha256=sha256, size=size, new=new)
+
+def _discard(saved: SavedUpload) -> None:
+    # only files this request created; shared content may be referenced elsewhere
+    if saved.new:
+        (UPLOAD_DIR / Path(saved.path).name).unlink(missing_ok=True)
+
+async def save_upload(file: UploadFile | None, budget: _Budget | None = None) -> SavedUpload | None:
+    if not file or not file.filename:
+        return None
+    if file.size is not None and file.size > UPLOAD_MAX_FILE_BYTES:
+        raise _too_large(file.filename, UPLOAD_MAX_FILE_BYTES)
+
+    budget = budget or _Budget(UPLOAD_MAX_REQUEST_BYTES)
+    await file.seek(0)
+    return await run_in_threadpool(_write_stream, file.file, file.filename, budget)
+
+async def save_uploads(files: list[UploadFile]) -> list[SavedUpload]:
+    # Writes files concurrently; if any fails, the others are removed again.
+    known = sum(f.size or 0 for f in files if f and f.filename)
+    if known > UPLOAD_MAX_REQUEST_BYTES:
+        raise _too_large("request", UPLOAD_MAX_REQUEST_BYTES)
+
+    budget = _Budget(UPLOAD_MAX_REQUEST_BYTES)
+    results = await asyncio.gather(*(save_upload(f, budget) for f in files), return_exceptions=True)
+    saved = [r for r in results if isinstance(r, SavedUpload)]
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        await discard_uploads(saved)
+        raise errors[0]
+    return saved
+
+async def discard_uploads(saved: list[SavedUpload]) -> None:
+    # For when the rows that would reference the files could not be written:
+    # without a blob row, collect_garbage() would never find them.
+    for s in saved:
+        await run_in_threadpool(_discard, s)
+
+class UploadLimitMiddleware:
+    """Refuse oversized multipart requests before the form parser spools them.
+
+    Checks Content-Length up front and, for bodies without one, stops reading
+    once the limit is passed. save_upload()'s checks stay as the backstop.
+    """
+
+    def __init__(self, app, limit: int = UPLOAD_MAX_REQUEST_BYTES + MULTIPART_OVERHEAD_BYTES):
+        self.app = app
+        self.limit = limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers", []))
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        length = headers.get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.limit:
+            body = f"request exceeds {UPLOAD_MAX_REQUEST_BYTES} bytes".encode()
+            await send({
+                "type": "http.response.start",
+                "status": 413,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8"), (b"content-length", str(len(body)).encode())],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    raise _too_large("request", UPLOAD_MAX_REQUEST_BYTES)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+def register_blobs(conn: sqlite3.Connection, saved: list[SavedUpload]) -> None:
+    # Call before inserting the rows that reference the files, in the same
+    # transaction, so the refcount triggers find the blob rows.
+    conn.executemany(
+        """
+        INSERT INTO upload_blobs (path, sha256, size) VALUES (?, ?, ?)
+        ON CONFLICT(path) DO UPDATE SET created_at = datetime('now')
+        """,
+        [(s.path, s.sha256, s.size) for s in saved],
+    )
+
+def collect_garbage(conn: sqlite3.Connection, grace_seconds: int = 3600, dry_run: bool = False) -> dict:
+    # Blobs whose refcount dropped to zero are removed once older than the
+    # grace period (uploads are written before the rows that reference them).
+    # References are re-checked directly in case a refcount drifted.
+    rows = conn.execute(
+        """
+        SELECT path, size FROM upload_blobs
+        WHERE refcount <= 0
+          AND created_at < datetime('now', ?)
+          AND path NOT IN (SELECT image_path FROM items WHERE image_path IS NOT NULL)
+          AND path NOT IN (SELECT image_path FROM closet_photos WHERE image_path IS NOT NULL)
+        """,
+        (f"-{int(grace_seconds)} seconds",),
+    ).fetchall()
+
+    if not dry_run and rows:
+        conn.executemany("DELETE FROM upload_blobs WHERE path = ?", [(r["path"],) for r in rows])
+        conn.commit()
+        for r in rows:
+            (UPLOAD_DIR / Path(r["path"]).name).unlink(missing_ok=True)
+
+    return {
+        "removed": len(rows),
+        "bytes": sum(r["size"] for r in rows),
+        "dry_run": dry_run,
+        "paths": [r["path"] for r in rows],
+    }
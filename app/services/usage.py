@@ -0,0 +1,59 @@
+import sqlite3
+from itertools import combinations
+
+# co-worn pairs handed to the solver, most often worn together first
+PAIRINGS_LIMIT = 200
+PAIRING_MIN_COUNT = 2
+
+RECENT_WEAR_SQL = "SELECT item_id, last_outfit_id FROM item_usage WHERE last_outfit_id > ?"
+PAIRINGS_SQL = """
+    SELECT p.item_a, p.item_b, p.count, ua.wear_count AS wear_a, ub.wear_count AS wear_b
+    FROM item_pairs p
+    JOIN item_usage ua ON ua.item_id = p.item_a
+    JOIN item_usage ub ON ub.item_id = p.item_b
+    WHERE p.count >= ?
+    ORDER BY p.count DESC
+    LIMIT ?
+"""
+
+def record_outfit_usage(conn: sqlite3.Connection, outfit_id: int, item_ids) -> None:
+    # Bump item_usage/item_pairs for one saved outfit. Runs in the caller's
+    # transaction, so the aggregates commit (or roll back) with the outfit.
+    ids = sorted(set(item_ids))
+    conn.executemany(
+        """
+        INSERT INTO item_usage (item_id, wear_count, last_outfit_id, last_worn_at)
+        VALUES (?, 1, ?, datetime('now'))
+        ON CONFLICT (item_id) DO UPDATE SET
+          wear_count = wear_count + 1,
+          last_outfit_id = excluded.last_outfit_id,
+          last_worn_at = excluded.last_worn_at
+        """,
+        [(item_id, outfit_id) for item_id in ids],
+    )
+    conn.executemany(
+        """
+        INSERT INTO item_pairs (item_a, item_b, count, last_outfit_id) VALUES (?, ?, 1, ?)
+        ON CONFLICT (item_a, item_b) DO UPDATE SET
+          count = count + 1,
+          last_outfit_id = excluded.last_outfit_id
+        """,
+        [(a, b, outfit_id) for a, b in combinations(ids, 2)],
+    )
+
+def recent_wear(conn: sqlite3.Connection, window: int) -> dict[int, int]:
+    # item id -> how many outfits back it was last worn (0 = the latest), for
+    # items worn in the last `window` saved outfits.
+    latest = conn.execute("SELECT MAX(id) FROM outfits").fetchone()[0]
+    if latest is None:
+        return {}
+    rows = conn.execute(RECENT_WEAR_SQL, (latest - window,)).fetchall()
+    return {r["item_id"]: latest - r["last_outfit_id"] for r in rows}
+
+def load_pairings(
+    conn: sqlite3.Connection, min_count: int = PAIRING_MIN_COUNT, limit: int = PAIRINGS_LIMIT
+) -> dict[tuple[int, int], float]:
+    # (item_a, item_b) with item_a < item_b -> share of the less-worn item's
+    # outfits that also had the other one (0..1]
+    rows = conn.execute(PAIRINGS_SQL, (min_count, limit)).fetchall()
+    return {(r["item_a"], r["item_b"]): r["count"] / max(1, min(r["wear_a"], r["wear_b"])) for r in rows}
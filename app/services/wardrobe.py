@@ -0,0 +1,192 @@
+import sqlite3
+import threading
+import time
+
+from app.services.color_utils import color_family, hex_to_hsl_batch
+from app.services.outfit_engine import ALL_SLOTS, CONTEXT_RULES, CandidatePool
+
+# Columns read by the outfit engine and the outfit templates, all held by
+# idx_items_engine_covering. Items also get color_family, derived from HSL.
+ENGINE_COLUMNS = (
+    "id", "name", "category", "color_primary", "image_path", "warmth", "formality",
+    "color_h", "color_s", "color_l",
+)
+
+BACKFILL_HSL_SQL = """
+    SELECT id, color_hex FROM items
+    WHERE id > ? AND color_h IS NULL AND color_hex IS NOT NULL
+    ORDER BY id LIMIT ?
+"""
+
+def min_formality(context: str) -> int:
+    return CONTEXT_RULES.get(context, {}).get("formality_min", 1)
+
+def candidates_sql(context: str | None = None) -> tuple[str, tuple]:
+    # One covering-index range per slot category (see query_plans.HOT_QUERIES).
+    cols = ", ".join(ENGINE_COLUMNS)
+    placeholders = ", ".join("?" for _ in ALL_SLOTS)
+    sql = f"SELECT {cols} FROM items WHERE category IN ({placeholders})"
+    params: tuple = tuple(ALL_SLOTS)
+    if context is not None:
+        sql += " AND formality >= ?"
+        params += (min_formality(context),)
+    return sql, params
+
+def items_by_id_sql(ids: list[int]) -> tuple[str, tuple]:
+    cols = ", ".join(ENGINE_COLUMNS)
+    placeholders = ", ".join("?" for _ in ids)
+    return f"SELECT {cols} FROM items WHERE id IN ({placeholders})", tuple(ids)
+
+def _engine_items(rows) -> list[dict]:
+    items = [dict(r) for r in rows]
+    for it in items:
+        it["color_family"] = color_family(it["color_h"], it["color_s"], it["color_l"])
+    return items
+
+def load_candidates(conn: sqlite3.Connection, context: str | None = None) -> list[dict]:
+    return _engine_items(conn.execute(*candidates_sql(context)))
+
+def load_items_by_id(conn: sqlite3.Connection, ids: list[int]) -> list[dict]:
+    if not ids:
+        return []
+    return _engine_items(conn.execute(*items_by_id_sql(ids)))
+
+def wardrobe_version(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT version FROM wardrobe_state WHERE id = 1").fetchone()
+    return int(row["version"]) if row else 0
+
+def backfill_hsl(conn: sqlite3.Connection, chunk_size: int = 5000, after_id: int = 0, pause: float = 0.0) -> dict:
+    """Fill color_h/s/l for items that have a color_hex but no HSL yet.
+
+    Walks items by id in chunks, one short transaction per chunk, so the site
+    keeps writing in between. Safe to interrupt and rerun: converted rows no
+    longer match, and after_id skips ahead.
+    """
+    started = time.perf_counter()
+    scanned = updated = 0
+    last_id = after_id
+    while True:
+        rows = conn.execute(BACKFILL_HSL_SQL, (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        scanned += len(rows)
+
+        converted = hex_to_hsl_batch([r["color_hex"] for r in rows])
+        params = [(*hsl, r["id"]) for r, hsl in zip(rows, converted) if hsl]
+        with conn:
+            cur = conn.executemany(
+                "UPDATE items SET color_h = ?, color_s = ?, color_l = ? WHERE id = ? AND color_h IS NULL", params
+            )
+        updated += max(cur.rowcount, 0)
+        if pause:
+            time.sleep(pause)
+
+    return {
+        "scanned": scanned,
+        "updated": updated,
+        "skipped": scanned - updated,
+        "last_id": last_id,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+class _SnapshotState:
+    def __init__(self, version: int | None, groups: dict[tuple[str, int], list[dict]]):
+        self.version = version
+        self.groups = groups
+        self.by_id = {it["id"]: it for group in groups.values() for it in group}
+        self.by_context: dict[int, list[dict]] = {}
+        self.pools: dict[int, CandidatePool] = {}
+
+class WardrobeSnapshot:
+    """Process-wide copy of the slot items, grouped by (category, formality).
+
+    Rebuilt only when wardrobe_state.version moves, which the items triggers
+    bump on every insert/update/delete (from any process). Cached item dicts
+    are shared between requests and must not be mutated.
+    """
+
+    # stats() key -> (metric type, help), for /metrics
+    STATS_METRICS = {
+        "version": ("gauge", "wardrobe_state.version the snapshot was built from."),
+        "items": ("gauge", "Items held by the snapshot."),
+        "hits": ("counter", "Requests served from the current snapshot."),
+        "misses": ("counter", "Requests that found the snapshot out of date."),
+        "rebuilds": ("counter", "Snapshot rebuilds."),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = _SnapshotState(None, {})
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+
+    def _current(self, conn: sqlite3.Connection) -> _SnapshotState:
+        version = wardrobe_version(conn)
+        state = self._state
+        if version == state.version:
+            self.hits += 1
+            return state
+
+        with self._lock:
+            self.misses += 1
+            if version == self._state.version:
+                return self._state
+            groups: dict[tuple[str, int], list[dict]] = {}
+            for it in load_candidates(conn):
+                groups.setdefault((it["category"], int(it["formality"])), []).append(it)
+            self._state = _SnapshotState(version, groups)
+            self.rebuilds += 1
+            return self._state
+
+    def _candidates(self, state: _SnapshotState, context: str) -> list[dict]:
+        floor = min_formality(context)
+        items = state.by_context.get(floor)
+        if items is None:
+            items = [
+                it
+                for (_, formality), group in sorted(state.groups.items())
+                if formality >= floor
+                for it in group
+            ]
+            state.by_context[floor] = items
+        return items
+
+    def candidates(self, conn: sqlite3.Connection, context: str) -> list[dict]:
+        return self._candidates(self._current(conn), context)
+
+    def pool(self, conn: sqlite3.Connection, context: str) -> CandidatePool:
+        # keeps the engine's per-category hue arrays and indexes across requests
+        return self._pool(self._current(conn), context)
+
+    def pools(self, conn: sqlite3.Connection, contexts) -> dict[str, CandidatePool]:
+        # one version check for a whole batch of contexts
+        state = self._current(conn)
+        return {context: self._pool(state, context) for context in contexts}
+
+    def _pool(self, state: _SnapshotState, context: str) -> CandidatePool:
+        floor = min_formality(context)
+        pool = state.pools.get(floor)
+        if pool is None:
+            pool = state.pools[floor] = CandidatePool(self._candidates(state, context), context)
+        return pool
+
+    def items_by_id(self, conn: sqlite3.Connection, ids: list[int]) -> list[dict]:
+        state = self._current(conn)
+        found = [state.by_id[i] for i in ids if i in state.by_id]
+        # items outside the slot categories are not cached
+        missing = [i for i in ids if i not in state.by_id]
+        return found + load_items_by_id(conn, missing)
+
+    def stats(self) -> dict:
+        state = self._state
+        return {
+            "version": state.version,
+            "items": len(state.by_id),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rebuilds": self.rebuilds,
+        }
+
+snapshot = WardrobeSnapshot()
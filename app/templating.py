@@ -0,0 +1,7 @@
+from fastapi.templating import Jinja2Templates
+
+from app.services.thumbnails import thumb_srcset, thumb_url
+
+templates = Jinja2Templates(directory="app/templates")
+templates.env.filters["thumb"] = thumb_url
+templates.env.filters["thumb_srcset"] = thumb_srcset
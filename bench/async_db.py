@@ -0,0 +1,145 @@
+"""Concurrent throughput of async handlers: blocking sqlite calls vs run_db.
+
+    python -m bench.async_db [--clients 32] [--seconds 5] [--hold-ms 20]
+
+Each client loops over a mix of outfit saves (async handler) and item page
+reads (sync handler). A background thread keeps taking the write lock, as the
+job worker and bulk ingest do, so writers sometimes wait in busy_timeout.
+"blocking" runs the pre-run_db handler, which waits on the event loop;
+"run_db" is the current /outfits/save.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import RedirectResponse
+
+from app.db import database
+from app.routers.items import router as items_router
+from app.routers.outfits_ui import router as outfits_ui_router
+from bench.wardrobe import generate_wardrobe
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(items_router)
+    app.include_router(outfits_ui_router)
+
+    @app.post("/bench/save-blocking")
+    async def save_blocking(request: Request, conn: sqlite3.Connection = Depends(database.get_db)):
+        # outfits_save as it was: sqlite calls straight from the async handler
+        form = await request.form()
+        cur = conn.execute("INSERT INTO outfits (context, locked_slots) VALUES (?, ?)", (form["context"], ""))
+        for slot in ("top", "bottom"):
+            conn.execute(
+                "INSERT INTO outfit_items (outfit_id, item_id, slot) VALUES (?, ?, ?)",
+                (cur.lastrowid, int(form[f"{slot}_id"]), slot),
+            )
+        conn.commit()
+        return RedirectResponse(url="/outfits", status_code=303)
+
+    return app
+
+def seed(items: int) -> None:
+    database.init_db()
+    conn = database.get_conn()
+    generate_wardrobe(conn, items, outfits=0)
+    conn.close()
+
+def lock_holder(stop: threading.Event, hold: float, gap: float) -> None:
+    conn = database.get_conn()
+    while not stop.is_set():
+        conn.execute("BEGIN IMMEDIATE")
+        time.sleep(hold)
+        conn.commit()
+        time.sleep(gap)
+    conn.close()
+
+async def run_mode(app: FastAPI, save_url: str, clients: int, seconds: float, write_ratio: float, items: int) -> dict:
+    reads: list[float] = []
+    writes: list[float] = []
+    lag = [0.0]
+    deadline = time.perf_counter() + seconds
+
+    async def ticker():
+        # how late the event loop wakes a 5ms sleeper
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lag[0] = max(lag[0], time.perf_counter() - t0 - 0.005)
+
+    async def client(n: int, http: httpx.AsyncClient):
+        rng = random.Random(n)
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            if rng.random() < write_ratio:
+                top_id, bottom_id = rng.sample(range(1, items + 1), 2)
+                data = {"context": "office", "top_id": top_id, "bottom_id": bottom_id}
+                r = await http.post(save_url, data=data)
+                writes.append(time.perf_counter() - t0)
+            else:
+                r = await http.get("/api/items", params={"category": "top", "limit": 20})
+                reads.append(time.perf_counter() - t0)
+            assert r.status_code in (200, 303), r.text
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        started = time.perf_counter()
+        await asyncio.gather(ticker(), *(client(n, http) for n in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    def pct(values: list[float], q: float) -> float:
+        return round(statistics.quantiles(values, n=100)[q - 1] * 1000, 2) if len(values) > 1 else 0.0
+
+    return {
+        "requests_per_second": round((len(reads) + len(writes)) / elapsed, 1),
+        "reads": len(reads),
+        "writes": len(writes),
+        "read_ms_p50": pct(reads, 50),
+        "read_ms_p95": pct(reads, 95),
+        "write_ms_p50": pct(writes, 50),
+        "write_ms_p95": pct(writes, 95),
+        "event_loop_lag_ms_max": round(lag[0] * 1000, 2),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    parser.add_argument("--hold-ms", type=float, default=20.0, help="how long the background writer holds the lock")
+    parser.add_argument("--gap-ms", type=float, default=30.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "bench.sqlite3"
+        seed(args.items)
+        app = build_app()
+
+        stop = threading.Event()
+        holder = threading.Thread(target=lock_holder, args=(stop, args.hold_ms / 1000, args.gap_ms / 1000), daemon=True)
+        holder.start()
+        results = {}
+        try:
+            for mode, url in (("blocking", "/bench/save-blocking"), ("run_db", "/outfits/save")):
+                results[mode] = asyncio.run(
+                    run_mode(app, url, args.clients, args.seconds, args.write_ratio, args.items)
+                )
+        finally:
+            stop.set()
+            holder.join()
+            database.pool.close()
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Per-image latency of dominant-colour extraction at phone-photo sizes.
+
+    python -m bench.color_extract [--repeat 20] [--quality 90]
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from app.services import color_extract
+
+# (label, width, height): common phone camera outputs
+SIZES = [("3mp", 2048, 1536), ("12mp", 4032, 3024), ("48mp", 8064, 6048)]
+
+def synthetic_photo(path: Path, width: int, height: int, quality: int, seed: int) -> None:
+    # noisy background with a solid garment-sized block, so the JPEG is not trivially small
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (height // 8, width // 8, 3), dtype=np.uint8)
+    img = Image.fromarray(small).resize((width, height), Image.BILINEAR)
+    color = tuple(int(v) for v in rng.integers(0, 256, 3))
+    img.paste(color, (width // 4, height // 4, width * 3 // 4, height * 3 // 4))
+    img.save(path, "JPEG", quality=quality)
+
+def run(repeat: int, quality: int) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, w, h in SIZES:
+            paths = []
+            for i in range(repeat):
+                p = Path(tmp) / f"{label}-{i}.jpg"
+                synthetic_photo(p, w, h, quality, seed=i)
+                paths.append(p)
+
+            cold = []
+            for p in paths:
+                t0 = time.perf_counter()
+                color_extract.dominant_color(p)
+                cold.append((time.perf_counter() - t0) * 1000)
+
+            t0 = time.perf_counter()
+            for p in paths:
+                color_extract.dominant_color(p)
+            cached = (time.perf_counter() - t0) * 1000 / len(paths)
+
+            results[label] = {
+                "pixels": w * h,
+                "cold_ms_p50": round(statistics.median(cold), 2),
+                "cold_ms_max": round(max(cold), 2),
+                "cached_ms": round(cached, 3),
+            }
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--quality", type=int, default=90)
+    args = parser.parse_args()
+    print(json.dumps(run(args.repeat, args.quality), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""Engine, query and route timings over synthetic wardrobes.
+
+    python -m bench run [--sizes 1000,10000] [--repeat 30] [--out results.json] [--baseline old.json]
+    python -m bench compare old.json new.json [--threshold 0.25]
+
+Results are JSON: {"meta": {...}, "results": {"<size>": {"<case>": {"p50_ms": ...}}}}.
+compare (and run --baseline) exits 1 when a case's p50 got slower than the
+threshold allows.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from app.db import database
+from app.services.history import load_history
+from app.services.listing import load_items_page
+from app.services.outfit_engine import fill_outfit, generate_outfit, generate_outfits, step_slot
+from app.services.outfit_solver import RECENCY_WINDOW, solve_outfits
+from app.services.search import search_items
+from app.services.usage import load_pairings, recent_wear
+from app.services.wardrobe import WardrobeSnapshot
+from bench.wardrobe import CATEGORY_MIX, generate_wardrobe, parse_mix
+
+try:
+    import httpx
+except ImportError:  # optional: route timings are skipped without it
+    httpx = None
+
+ROUTES = [
+    ("GET", "/items"),
+    ("GET", "/items?category=top&color_family=blue"),
+    ("GET", "/api/items?limit=60&formality_min=3"),
+    ("GET", "/items/search?q=wool"),
+    ("GET", "/api/search?q=linen%20bl"),
+    ("GET", "/outfits?context=office"),
+    ("GET", "/outfits?context=office&locked=top&top_id=1&bottom_id=2&bottom_rank=3&reroll=bottom"),
+    ("POST", "/api/outfits/generate?context=office"),
+    ("GET", "/history"),
+    ("GET", "/api/history"),
+]
+# ignore p50 changes smaller than this; sub-50µs cases are mostly timer noise
+MIN_DELTA_MS = 0.05
+
+def summarize(samples: list[float]) -> dict:
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "n": len(ms),
+        "min_ms": round(ms[0], 4),
+        "p50_ms": round(statistics.median(ms), 4),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 4),
+        "mean_ms": round(statistics.fmean(ms), 4),
+    }
+
+def time_calls(fn: Callable[[int], object], repeat: int) -> dict:
+    fn(-1)  # warm up caches
+    samples = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples)
+
+def engine_cases(conn: sqlite3.Connection, repeat: int) -> dict:
+    results = {}
+    results["engine.snapshot_rebuild"] = time_calls(lambda i: WardrobeSnapshot().pool(conn, "office"), max(3, repeat // 5))
+
+    pool = WardrobeSnapshot().pool(conn, "office")
+    top = next(iter(pool.by_category.get("top", [])), None)
+    locked = {"top": top} if top else None
+    results["engine.generate_outfit"] = time_calls(lambda i: generate_outfit(pool, "office", seed=i), repeat)
+    results["engine.generate_outfits"] = time_calls(lambda i: generate_outfits(pool, "office", k=5, seed=i), repeat)
+    results["engine.generate_outfits_ranked"] = time_calls(
+        lambda i: generate_outfits(pool, "office", k=5, seed=i, ranked=True), repeat
+    )
+    results["engine.generate_outfits_locked"] = time_calls(
+        lambda i: generate_outfits(pool, "office", k=5, seed=i, locked=locked), repeat
+    )
+    outfit = fill_outfit(pool, locked or {}, ("top",))
+    results["engine.reroll_locked"] = time_calls(lambda i: step_slot(pool, outfit, "bottom", i + 1, ("top",)), repeat)
+    # target: under 20ms p50 at 10k items
+    last_worn = recent_wear(conn, RECENCY_WINDOW)
+    pairings = load_pairings(conn)
+    results["engine.solve_outfits"] = time_calls(
+        lambda i: solve_outfits(pool, k=3, warmth=i % 5 + 1, last_worn=last_worn, pairings=pairings), repeat
+    )
+
+    results["db.load_history"] = time_calls(lambda i: load_history(conn), repeat)
+    results["db.load_items_page"] = time_calls(lambda i: load_items_page(conn, category="top", formality_min=3), repeat)
+    results["db.search_items"] = time_calls(lambda i: search_items(conn, "linen bl"), repeat)
+    results["db.usage"] = time_calls(lambda i: (recent_wear(conn, RECENCY_WINDOW), load_pairings(conn)), repeat)
+    return results
+
+async def route_cases(repeat: int) -> dict:
+    from app.main import app
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        for method, url in ROUTES:
+            await http.request(method, url)
+            samples = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                r = await http.request(method, url)
+                samples.append(time.perf_counter() - t0)
+                if r.status_code >= 400:
+                    raise RuntimeError(f"{method} {url} -> {r.status_code}")
+            results[f"route.{method} {url}"] = summarize(samples)
+    return results
+
+def run(sizes: list[int], repeat: int, category_mix: dict[str, float], hues: str, formality: str, routes: bool) -> dict:
+    results = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.DB_PATH = Path(tmp) / "bench.sqlite3"
+            database.init_db()
+            conn = database.get_conn()
+            t0 = time.perf_counter()
+            generate_wardrobe(conn, size, category_mix=category_mix, hues=hues, formality=formality)
+            print(f"[bench] {size} items generated in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+            try:
+                cases = engine_cases(conn, repeat)
+                if routes and httpx is not None:
+                    cases.update(asyncio.run(route_cases(repeat)))
+            finally:
+                conn.close()
+                database.pool.close()
+            results[str(size)] = cases
+    return results
+
+def compare(old: dict, new: dict, threshold: float) -> list[dict]:
+    rows = []
+    for size, cases in new["results"].items():
+        for case, stats in cases.items():
+            before = old["results"].get(size, {}).get(case)
+            if not before:
+                continue
+            ratio = stats["p50_ms"] / before["p50_ms"] if before["p50_ms"] else 1.0
+            regressed = ratio > 1 + threshold and stats["p50_ms"] - before["p50_ms"] > MIN_DELTA_MS
+            rows.append({
+                "size": size,
+                "case": case,
+                "old_p50_ms": before["p50_ms"],
+                "new_p50_ms": stats["p50_ms"],
+                "ratio": round(ratio, 3),
+                "regressed": regressed,
+            })
+    return rows
+
+def print_comparison(rows: list[dict]) -> bool:
+    for r in rows:
+        flag = "REGRESSED" if r["regressed"] else ""
+        print(f"{r['size']:>8} {r['case']:<52} {r['old_p50_ms']:>10.3f} -> {r['new_p50_ms']:>10.3f} ms  x{r['ratio']:<6} {flag}")
+    return any(r["regressed"] for r in rows)
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Digital Wardrobe benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_p = sub.add_parser("run", help="generate wardrobes and time the engine and routes")
+    run_p.add_argument("--sizes", default="1000,10000", help="comma-separated item counts (up to 1000000)")
+    run_p.add_argument("--repeat", type=int, default=30)
+    run_p.add_argument("--categories", default=None, help="e.g. top=0.4,bottom=0.3,shoes=0.3")
+    run_p.add_argument("--hues", choices=("uniform", "clustered"), default="uniform")
+    run_p.add_argument("--formality", choices=("uniform", "casual", "formal"), default="uniform")
+    run_p.add_argument("--no-routes", action="store_true", help="engine and query timings only")
+    run_p.add_argument("--out", type=Path, default=None, help="write results JSON here (default: stdout)")
+    run_p.add_argument("--baseline", type=Path, default=None, help="compare against an earlier results file")
+    run_p.add_argument("--threshold", type=float, default=0.25, help="allowed p50 slowdown, as a fraction")
+
+    cmp_p = sub.add_parser("compare", help="compare two results files")
+    cmp_p.add_argument("old", type=Path)
+    cmp_p.add_argument("new", type=Path)
+    cmp_p.add_argument("--threshold", type=float, default=0.25)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        old = json.loads(args.old.read_text())
+        new = json.loads(args.new.read_text())
+        raise SystemExit(1 if print_comparison(compare(old, new, args.threshold)) else 0)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    category_mix = parse_mix(args.categories) if args.categories else CATEGORY_MIX
+    if not args.no_routes and httpx is None:
+        print("[bench] httpx not installed; skipping route timings", file=sys.stderr)
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "hues": args.hues,
+            "formality": args.formality,
+            "categories": category_mix,
+        },
+        "results": run(sizes, args.repeat, category_mix, args.hues, args.formality, not args.no_routes),
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        old = json.loads(args.baseline.read_text())
+        raise SystemExit(1 if print_comparison(compare(old, report, args.threshold)) else 0)
@@ -0,0 +1,119 @@
+"""Synthetic wardrobes for benchmarks, written straight into a SQLite DB."""
+import colorsys
+import random
+import sqlite3
+
+from app.db.migrations import rebuild_search_index, rebuild_usage
+
+CATEGORY_MIX = {"top": 0.35, "bottom": 0.25, "shoes": 0.18, "outerwear": 0.12, "accessory": 0.10}
+# hue centres for "clustered" wardrobes: navy, black/grey handled via saturation, olive, rust, cream
+PALETTE = (220, 80, 20, 45)
+WORDS = (
+    "linen cotton wool denim oxford chino cashmere merino silk leather suede canvas "
+    "striped plaid slim relaxed cropped vintage crew polo hoodie blazer loafer sneaker boot trench parka"
+).split()
+COLORS = ("black", "white", "navy", "grey", "olive", "beige", "burgundy", "camel", "charcoal", "cream")
+INSERT_CHUNK = 20_000
+
+def parse_mix(text: str) -> dict[str, float]:
+    # "top=0.4,bottom=0.3,shoes=0.3" -> weights
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    return mix
+
+def _hue(rng: random.Random, hues: str) -> int:
+    if hues == "clustered":
+        return int(rng.gauss(rng.choice(PALETTE), 12)) % 360
+    return rng.randrange(360)
+
+def _formality(rng: random.Random, formality: str) -> int:
+    if formality == "casual":
+        return rng.choices((1, 2, 3, 4, 5), weights=(30, 30, 20, 12, 8))[0]
+    if formality == "formal":
+        return rng.choices((1, 2, 3, 4, 5), weights=(8, 12, 20, 30, 30))[0]
+    return rng.randint(1, 5)
+
+def _item(rng: random.Random, categories: list[str], weights: list[float], hues: str, formality: str, n: int) -> tuple:
+    h = _hue(rng, hues)
+    s = rng.choice((5, 10, 40, 60, 80))
+    l = rng.randint(15, 85)
+    r, g, b = (round(v * 255) for v in colorsys.hls_to_rgb(h / 360, l / 100, s / 100))
+    return (
+        " ".join(rng.sample(WORDS, 2)) + f" {n}",
+        rng.choices(categories, weights)[0],
+        rng.choice(COLORS),
+        rng.randint(1, 5),
+        _formality(rng, formality),
+        " ".join(rng.choices(WORDS, k=rng.randint(0, 6))) or None,
+        f"#{r:02X}{g:02X}{b:02X}",
+        h,
+        s,
+        l,
+    )
+
+def generate_wardrobe(
+    conn: sqlite3.Connection,
+    items: int,
+    category_mix: dict[str, float] = CATEGORY_MIX,
+    hues: str = "uniform",
+    formality: str = "uniform",
+    outfits: int | None = None,
+    seed: int = 0,
+) -> dict:
+    """Insert `items` random items (and saved outfits, default items // 10).
+
+    hues: "uniform" or "clustered" (a few palette centres).
+    formality: "uniform", "casual" or "formal" skew.
+    Deterministic for a given seed. Returns the counts written.
+    """
+    rng = random.Random(seed)
+    categories = list(category_mix)
+    weights = [category_mix[c] for c in categories]
+
+    # Row-by-row FTS triggers dominate bulk inserts; index in one pass instead.
+    # Same transaction, so the trigger is never missing for anyone else.
+    fts_trigger = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_items_fts_insert'"
+    ).fetchone()
+    first_item = conn.execute("SELECT coalesce(max(id), 0) + 1 FROM items").fetchone()[0]
+    with conn:
+        if fts_trigger:
+            conn.execute("DROP TRIGGER trg_items_fts_insert")
+        for start in range(0, items, INSERT_CHUNK):
+            rows = [_item(rng, categories, weights, hues, formality, n) for n in range(start, min(start + INSERT_CHUNK, items))]
+            conn.executemany(
+                """
+                INSERT INTO items (name, category, color_primary, warmth, formality, notes, color_hex, color_h, color_s, color_l)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+        if fts_trigger:
+            rebuild_search_index(conn)
+            conn.execute(fts_trigger[0])
+
+    outfits = items // 10 if outfits is None else outfits
+    # three distinct pieces per outfit, fewer when the wardrobe is that small
+    pieces = min(3, items)
+    if not pieces:
+        outfits = 0
+    if outfits:
+        with conn:
+            first = conn.execute("SELECT coalesce(max(id), 0) + 1 FROM outfits").fetchone()[0]
+            conn.executemany(
+                "INSERT INTO outfits (context, locked_slots) VALUES (?, '')",
+                [(rng.choice(("office", "brunch", "date", "gym")),) for _ in range(outfits)],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO outfit_items (outfit_id, item_id, slot) VALUES (?, ?, ?)",
+                [
+                    (outfit_id, item_id, slot)
+                    for outfit_id in range(first, first + outfits)
+                    for slot, item_id in zip(("top", "bottom", "shoes"), rng.sample(range(first_item, first_item + items), pieces))
+                ],
+            )
+            rebuild_usage(conn)
+
+    return {"items": items, "outfits": outfits}
@@ -0,0 +1,93 @@
+from app.services.color_utils import color_family
+from app.services.outfit_engine import (
+    FRESH_LOOKAHEAD,
+    SLOTS,
+    CandidatePool,
+    fill_outfit,
+    generate_outfits,
+    harmony_score,
+    iter_outfits,
+    step_slot,
+)
+
+def _item(item_id: int, category: str, h: int) -> dict:
+    return {
+        "id": item_id, "name": f"{category} {item_id}", "category": category,
+        "warmth": 3, "formality": 3, "color_h": h, "color_s": 60, "color_l": 50,
+        "color_family": color_family(h, 60, 50),
+    }
+
+def _pool(per_hue: int = 2) -> CandidatePool:
+    # every 10 degrees, per_hue items of each hue, in every slot
+    items = []
+    for category in SLOTS:
+        for h in range(0, 360, 10):
+            for _ in range(per_hue):
+                items.append(_item(len(items) + 1, category, h))
+    return CandidatePool(items, "office")
+
+def test_ranked_slot_orders_by_harmony_with_the_anchor():
+    pool = _pool()
+    ranked = pool.ranked("bottom", 40)
+    scores = [harmony_score(40, ranked[r]["color_h"]) for r in range(len(ranked))]
+
+    assert len(ranked) == len(pool.by_category["bottom"])
+    assert scores == sorted(scores, reverse=True)
+    assert ranked[0] is pool.best_match("bottom", 40)
+
+def test_fill_outfit_matches_empty_slots_to_the_locked_item():
+    pool = _pool()
+    top = pool.by_category["top"][10]
+    ranks = {}
+    outfit = fill_outfit(pool, {"top": top}, ("top",), ranks=ranks)
+
+    assert outfit["top"] is top
+    for slot in ("bottom", "shoes", "outerwear"):
+        assert outfit[slot] is pool.ranked(slot, top["color_h"])[0]
+        assert ranks[slot] == 0
+
+def test_step_slot_walks_every_candidate_once():
+    pool = _pool()
+    top = pool.by_category["top"][0]
+    outfit = fill_outfit(pool, {"top": top}, ("top",))
+    n = len(pool.by_category["shoes"])
+
+    seen = [step_slot(pool, {"top": top}, "shoes", rank, ("top",))[0]["id"] for rank in range(n)]
+    assert len(set(seen)) == n
+
+    # asking for the current item's own rank moves on to the next one
+    item, rank = step_slot(pool, outfit, "shoes", 0, ("top",))
+    assert rank == 1
+    assert item["id"] != outfit["shoes"]["id"]
+
+def test_last_worn_steers_outfits_away_from_worn_items():
+    pool = _pool()
+    plain = generate_outfits(pool, "office", k=3, seed=7)
+    worn = {it["id"]: 0 for o in plain for it in o.values()}
+
+    fresh = generate_outfits(pool, "office", k=3, seed=7, last_worn=worn)
+    assert len(fresh) == 3
+    assert not [it["id"] for o in fresh for it in o.values() if it["id"] in worn]
+
+def test_last_worn_seeds_come_last():
+    pool = _pool(per_hue=1)
+    tops = pool.by_category["top"]
+    worn = {it["id"]: 0 for it in tops[:5]}
+
+    seeds = [o["top"]["id"] for o in iter_outfits(pool, "office", seed=3, last_worn=worn)]
+    assert set(seeds[-5:]) == set(worn)
+
+def test_fill_outfit_skips_recently_worn_within_the_lookahead():
+    pool = _pool()
+    top = pool.by_category["top"][0]
+    best = pool.ranked("bottom", top["color_h"])
+    ranks = {}
+    outfit = fill_outfit(pool, {"top": top}, ("top",), last_worn={best[0]["id"]: 0}, ranks=ranks)
+    assert outfit["bottom"] is best[1]
+    assert ranks["bottom"] == 1
+
+    # everything near the top of the ranking was worn: keep the best match
+    worn = {best[r]["id"]: 0 for r in range(FRESH_LOOKAHEAD)}
+    outfit = fill_outfit(pool, {"top": top}, ("top",), last_worn=worn, ranks=ranks)
+    assert outfit["bottom"] is best[0]
+    assert ranks["bottom"] == 0
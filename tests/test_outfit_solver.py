@@ -0,0 +1,37 @@
+from app.services.color_utils import color_family
+from app.services.outfit_engine import CandidatePool
+from app.services.outfit_solver import BEAM_WIDTH, solve_outfits
+
+def _item(item_id: int, category: str, h: int) -> dict:
+    return {
+        "id": item_id, "name": f"{category} {item_id}", "category": category,
+        "warmth": 3, "formality": 3, "color_h": h, "color_s": 60, "color_l": 50,
+        "color_family": color_family(h, 60, 50),
+    }
+
+def _pool() -> CandidatePool:
+    # 24 hues (every 15 degrees, 8 colour families) per top/bottom/shoes:
+    # far more whole outfits than BEAM_WIDTH
+    items = []
+    for category in ("top", "bottom", "shoes"):
+        for h in range(0, 360, 15):
+            items.append(_item(len(items) + 1, category, h))
+    return CandidatePool(items, "office")
+
+def test_returns_k_outfits_when_k_exceeds_beam_width():
+    k = BEAM_WIDTH + 8
+    outfits = solve_outfits(_pool(), k=k)
+
+    assert len(outfits) == k
+    keys = {tuple(sorted(it["id"] for it in o["outfit"].values())) for o in outfits}
+    assert len(keys) == k
+    scores = [o["score"] for o in outfits]
+    assert scores == sorted(scores, reverse=True)
+
+def test_locked_slot_is_kept():
+    pool = _pool()
+    top = pool.by_category["top"][5]
+    outfits = solve_outfits(pool, k=BEAM_WIDTH + 1, locked={"top": top})
+
+    assert len(outfits) == BEAM_WIDTH + 1
+    assert all(o["outfit"]["top"]["id"] == top["id"] for o in outfits)
@@ -0,0 +1,58 @@
+import sqlite3
+
+import pytest
+
+from app.db.migrations import migrate
+from app.db.query_plans import COVERING_QUERIES, HOT_QUERIES, check_query_plans, explain
+from app.services.history import HISTORY_OUTFITS_SQL, load_history
+from app.services.listing import items_page_sql, load_items_page
+from app.services.wardrobe import candidates_sql, load_candidates
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    migrate(conn)
+    yield conn
+    conn.close()
+
+@pytest.mark.parametrize("name", list(HOT_QUERIES))
+def test_hot_query_uses_an_index(conn, name):
+    [result] = check_query_plans(conn, {name: HOT_QUERIES[name]})
+    assert result["ok"], result["plan"]
+
+@pytest.mark.parametrize("name", sorted(COVERING_QUERIES))
+def test_engine_candidates_never_read_the_table(conn, name):
+    sql, params = HOT_QUERIES[name]
+    assert all("USING COVERING INDEX" in p for p in explain(conn, sql, params))
+
+def test_full_scans_and_temp_sorts_are_flagged(conn):
+    results = check_query_plans(conn, {
+        "filter": ("SELECT * FROM items WHERE notes = ?", ("x",)),
+        "filter, limit": ("SELECT * FROM items WHERE notes = ? LIMIT 5", ("x",)),
+        "temp sort": ("SELECT * FROM items ORDER BY name LIMIT 5", ()),
+        "first page": ("SELECT * FROM items ORDER BY id DESC LIMIT 5", ()),
+    })
+    assert {r["query"]: r["ok"] for r in results} == {
+        "filter": False, "filter, limit": False, "temp sort": False, "first page": True,
+    }
+
+def _traced(conn, fn) -> list[str]:
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        fn()
+    finally:
+        conn.set_trace_callback(None)
+    return [" ".join(s.split()) for s in statements]
+
+def test_checked_sql_is_the_sql_the_loaders_run(conn):
+    # the trace shows statements with their parameters bound, so compare up to
+    # the first placeholder
+    def prefix(sql: str) -> str:
+        return " ".join(sql.split()).split("?", 1)[0]
+
+    assert any(s.startswith(prefix(candidates_sql()[0])) for s in _traced(conn, lambda: load_candidates(conn)))
+    assert any(s.startswith(prefix(items_page_sql(None, 61)[0])) for s in _traced(conn, lambda: load_items_page(conn)))
+    conn.execute("INSERT INTO outfits (context, locked_slots) VALUES ('office', '')")
+    assert any(s.startswith(prefix(HISTORY_OUTFITS_SQL)) for s in _traced(conn, lambda: load_history(conn)))
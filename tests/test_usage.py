@@ -0,0 +1,39 @@
+import random
+import sqlite3
+
+from app.db.migrations import migrate, rebuild_usage
+from app.services.usage import load_pairings, record_outfit_usage
+
+def _aggregates(conn: sqlite3.Connection) -> tuple[list, list]:
+    # last_worn_at is left out: it is the save time, not derived from outfits
+    usage = conn.execute("SELECT item_id, wear_count, last_outfit_id FROM item_usage ORDER BY item_id").fetchall()
+    pairs = conn.execute("SELECT item_a, item_b, count, last_outfit_id FROM item_pairs ORDER BY item_a, item_b").fetchall()
+    return [tuple(r) for r in usage], [tuple(r) for r in pairs]
+
+def test_recorded_usage_matches_a_rebuild():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    migrate(conn)
+    conn.executemany(
+        "INSERT INTO items (name, category, color_primary, warmth, formality) VALUES (?, ?, 'black', 3, 3)",
+        [(f"item {i}", ("top", "bottom", "shoes")[i % 3]) for i in range(12)],
+    )
+    conn.execute("DELETE FROM item_usage")
+    conn.execute("DELETE FROM item_pairs")
+
+    rng = random.Random(1)
+    for _ in range(40):
+        # like /outfits/save: the outfit, its items, then the aggregates
+        outfit_id = conn.execute("INSERT INTO outfits (context, locked_slots) VALUES ('office', '')").lastrowid
+        item_ids = rng.sample(range(1, 13), rng.randint(1, 4))
+        conn.executemany(
+            "INSERT INTO outfit_items (outfit_id, item_id, slot) VALUES (?, ?, 'top')",
+            [(outfit_id, item_id) for item_id in item_ids],
+        )
+        record_outfit_usage(conn, outfit_id, item_ids)
+    recorded = _aggregates(conn)
+
+    rebuild_usage(conn)
+    assert _aggregates(conn) == recorded
+    assert recorded[1]
+    assert all(0 < share <= 1 for share in load_pairings(conn).values())